@@ -0,0 +1,171 @@
+"""
+benchmark the core solver and generator over the puzzles in corpus.json:
+    easy                 puzzles from db/seeds.json
+    seventeen_clue       puzzles with the minimum number of clues
+    hard                 puzzles known to defeat plain backtracking (anti brute force, AI Escargot, Platinum Blonde, Golden Nugget, Everest)
+    multiple_solutions   puzzles with more than one solution
+
+usage:
+    python -m benchmarks.run --save-baseline          # store this run as the baseline of this machine
+    python -m benchmarks.run                          # run everything and compare against benchmarks/baseline.json
+    python -m benchmarks.run --tasks solve_trail solve_dlx --repeat 10
+
+every input is timed --repeat times, in rounds over all the tasks, and only its fastest time is kept,
+as the slower ones measure other work on the machine rather than the code.
+the report is written as JSON to --output (stdout by default). the exit code is 1 if the mean of the fastest times
+of any task and category is slower than the baseline by more than --tolerance.
+timings depend on the machine, so the baseline is not committed: save one on the machine you compare on.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Optional
+
+from sudoku_api.core.sudoku import Sudoku
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(BENCHMARK_DIR, 'corpus.json')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+
+def solve_with(method: str) -> Callable[[Sudoku, str], object]:
+    return lambda sudoku, puzzle: sudoku.solve_puzzle(puzzle, method=method)
+
+
+TASKS: dict[str, Callable[[Sudoku, str], object]] = {
+    'solve_trail': solve_with('trail'),
+    'solve_naive': solve_with('naive'),
+    'solve_dlx': solve_with('dlx'),
+    'has_unique_solution': lambda sudoku, puzzle: sudoku.has_unique_solution(puzzle),
+    'evaluate_difficulty': lambda sudoku, puzzle: sudoku.evaluate_difficulty(puzzle),
+    'sofa_evaluate_difficulty': lambda sudoku, puzzle: sudoku.sofa_evaluate_difficulty(puzzle),
+    # the generator takes a seed rather than a puzzle
+    'generate_puzzle': lambda sudoku, seed: sudoku.generate_puzzle(seed),
+}
+GENERATE_SEEDS = [f'benchmark-{i}' for i in range(10)]
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """
+    the p-th percentile of samples by the nearest-rank method
+    >>> percentile([4, 1, 3, 2], 50)
+    2
+    >>> percentile([4, 1, 3, 2], 99)
+    4
+    >>> percentile(list(range(1, 101)), 99)
+    99
+    """
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples: list[float]) -> dict:
+    """
+    summarize the fastest timings of a task on every input of a category, in seconds
+    >>> summarize([0.002, 0.001, 0.001, 0.004])
+    {'count': 4, 'throughput': 500.0, 'mean_ms': 2.0, 'p50_ms': 1.0, 'p99_ms': 4.0}
+    """
+    total = sum(samples)
+    return {'count': len(samples),
+            'throughput': round(len(samples) / total, 3) if total else None,
+            'mean_ms': round(total / len(samples) * 1000, 3),
+            'p50_ms': round(percentile(samples, 50) * 1000, 3),
+            'p99_ms': round(percentile(samples, 99) * 1000, 3)}
+
+
+def time_inputs(task: Callable[[Sudoku, str], object], sudoku: Sudoku, inputs: list[str], best: list[float]) -> None:
+    """ time the task once on every input, keeping the fastest time of every input in best """
+    for (i, item) in enumerate(inputs):
+        start = time.perf_counter()
+        task(sudoku, item)
+        best[i] = min(best[i], time.perf_counter() - start)
+
+
+def run(task_names: list[str], categories: list[str], repeat: int) -> dict:
+    with open(CORPUS_PATH) as f:
+        corpus = json.load(f)
+    # the generator takes seeds rather than puzzles
+    inputs = {name: {'seeds': GENERATE_SEEDS} if name == 'generate_puzzle' else
+              {category: corpus[category] for category in categories}
+              for name in task_names}
+    best = {name: {category: [float('inf')] * len(items) for (category, items) in inputs[name].items()}
+            for name in task_names}
+    sudoku = Sudoku()
+    for name in task_names:
+        TASKS[name](sudoku, next(iter(inputs[name].values()))[0])  # warm up caches
+    # every round times every task, so that a slow spell of the machine only costs one round of each task
+    for _ in range(repeat):
+        for name in task_names:
+            for (category, items) in inputs[name].items():
+                time_inputs(TASKS[name], sudoku, items, best[name][category])
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'repeat': repeat,
+            'results': {name: {category: summarize(times) for (category, times) in best[name].items()}
+                        for name in task_names}}
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    compare the mean time of every task and category against a baseline report.
+    the mean takes every input of the category into account, where the p50 of a few inputs is the time of only one.
+    return the ones which got slower by more than the tolerance, as a fraction.
+    >>> baseline = {'results': {'solve_trail': {'easy': {'mean_ms': 1.0}, 'hard': {'mean_ms': 10.0}}}}
+    >>> report = {'results': {'solve_trail': {'easy': {'mean_ms': 1.1}, 'hard': {'mean_ms': 20.0}},
+    ...                       'solve_dlx': {'easy': {'mean_ms': 1.0}}}}
+    >>> compare(report, baseline, tolerance=0.2)
+    [{'task': 'solve_trail', 'category': 'hard', 'baseline_mean_ms': 10.0, 'mean_ms': 20.0, 'ratio': 2.0}]
+    """
+    regressions = []
+    for (task, categories) in report['results'].items():
+        for (category, summary) in categories.items():
+            base = baseline['results'].get(task, {}).get(category)
+            if not base or not base.get('mean_ms'):
+                continue
+            ratio = round(summary['mean_ms'] / base['mean_ms'], 3)
+            if ratio > 1 + tolerance:
+                regressions.append({'task': task, 'category': category, 'baseline_mean_ms': base['mean_ms'],
+                                    'mean_ms': summary['mean_ms'], 'ratio': ratio})
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Benchmark the sudoku solver and generator.')
+    parser.add_argument('--tasks', nargs='+', choices=list(TASKS), default=list(TASKS))
+    parser.add_argument('--categories', nargs='+', default=['easy', 'seventeen_clue', 'hard', 'multiple_solutions'])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timings of every input, of which the fastest is kept')
+    parser.add_argument('--output', help='write the report to this file instead of stdout')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown of the mean time against the baseline, as a fraction')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the report as the new baseline')
+    args = parser.parse_args(argv)
+
+    report = run(args.tasks, args.categories, args.repeat)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,3 +7,25 @@ class Config(object):
         'postgres://', 'postgresql://') or \
         'sqlite:////' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # number of processes solving POST /api/solver/batch in each gunicorn worker, so that the server runs
+    # (gunicorn workers) * SOLVER_POOL_WORKERS of them. keep the product near the number of cores.
+    SOLVER_POOL_WORKERS = int(os.environ.get('SOLVER_POOL_WORKERS', 2))
+    SOLVER_BATCH_LIMIT = int(os.environ.get('SOLVER_BATCH_LIMIT', 1000))
+    # LRU cache of solver results in each process. set the size to 0 to disable.
+    SOLVER_CACHE_SIZE = int(os.environ.get('SOLVER_CACHE_SIZE', 1024))
+    SOLVER_CACHE_TTL = float(os.environ.get('SOLVER_CACHE_TTL', 0)) or None
+    SOLVER_CACHE_ERRORS = os.environ.get('SOLVER_CACHE_ERRORS', '').lower() in ('1', 'true', 'yes')
+    # path of an SQLite file keeping solutions across restarts, shared by all worker processes. disabled if not set.
+    SOLUTION_STORE_PATH = os.environ.get('SOLUTION_STORE_PATH')
+    # limits of a single solve, in seconds and in search nodes. 0 means no limit.
+    # a request can lower them further with the X-Solver-Time-Limit and X-Solver-Node-Limit headers.
+    SOLVER_TIME_LIMIT = float(os.environ.get('SOLVER_TIME_LIMIT', 5)) or None
+    SOLVER_NODE_LIMIT = int(os.environ.get('SOLVER_NODE_LIMIT', 0)) or None
+    # puzzles served once each by GET /api/puzzles/fresh, kept in memory in every process in buckets by difficulty.
+    # a bucket with fewer than the low water mark is refilled up to the high water mark by PUZZLE_POOL_WORKERS processes,
+    # which every gunicorn worker runs on top of its SOLVER_POOL_WORKERS. 0 generates in a thread of the worker itself.
+    PUZZLE_POOL_SIZE = os.environ.get('PUZZLE_POOL_SIZE', '3x3')
+    PUZZLE_POOL_BUCKETS = os.environ.get('PUZZLE_POOL_BUCKETS', '0-99,100-199,200-299,300-499')
+    PUZZLE_POOL_LOW_WATER = int(os.environ.get('PUZZLE_POOL_LOW_WATER', 10))
+    PUZZLE_POOL_HIGH_WATER = int(os.environ.get('PUZZLE_POOL_HIGH_WATER', 50))
+    PUZZLE_POOL_WORKERS = int(os.environ.get('PUZZLE_POOL_WORKERS', 1))
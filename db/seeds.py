@@ -2,23 +2,19 @@
 #
 
 # ===== seeds script for importing puzzles from seed file
+# the same as `flask import-puzzles db/seeds.json`
 
-from app import db
-from sudoku_api.models.Puzzle import PuzzleSchema
+from app import app
+from sudoku_api.models.puzzle_import import import_puzzles
 
-schema = PuzzleSchema(many=True)
-seeds = None
-with open('db/seeds.json', 'r') as f:
-    file = f.read()
-    seeds = schema.loads(file)
-for puzzle in seeds:
-    db.session.add(puzzle)
-db.session.commit()
+with app.app_context(), open('db/seeds.json', 'r') as f:
+    for _ in import_puzzles(f):
+        pass
 
 # # ===== seeds script for generating new puzzles from scratch =====
 # from sudoku_api.models.Puzzle import generate_puzzles
 # from app import db
-# puzzles = generate_puzzles()
+# puzzles = generate_puzzles(seed='seeds')  # the same seed gives the same puzzles
 # for p in puzzles:
 #     db.session.add(p)
 # db.session.commit()
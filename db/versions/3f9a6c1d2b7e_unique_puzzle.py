@@ -0,0 +1,30 @@
+"""unique puzzle
+
+The upgrade deletes every duplicated puzzle but the one with the lowest id. This is permanent: the ids of the deleted
+rows disappear, and the downgrade only drops the unique index without restoring them.
+
+Revision ID: 3f9a6c1d2b7e
+Revises: 08e8427121cf
+Create Date: 2026-10-17 10:12:41.528113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a6c1d2b7e'
+down_revision = '08e8427121cf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # keep the first copy of every puzzle, so that the index can be unique. the other copies are lost for good
+    op.execute('DELETE FROM puzzles WHERE id NOT IN (SELECT MIN(id) FROM puzzles GROUP BY puzzle)')
+    op.create_index('ix_puzzles_puzzle', 'puzzles', ['puzzle'], unique=True)
+
+
+def downgrade():
+    # the duplicated puzzles deleted by the upgrade cannot be restored
+    op.drop_index('ix_puzzles_puzzle', table_name='puzzles')
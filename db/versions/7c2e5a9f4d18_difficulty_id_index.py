@@ -0,0 +1,26 @@
+"""difficulty id index
+
+Revision ID: 7c2e5a9f4d18
+Revises: 3f9a6c1d2b7e
+Create Date: 2026-10-17 11:03:27.940562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e5a9f4d18'
+down_revision = '3f9a6c1d2b7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pages of puzzles sorted by difficulty seek this index from their cursor.
+    # pages sorted by id use the primary key.
+    op.create_index('ix_puzzles_difficulty_id', 'puzzles', ['difficulty', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_puzzles_difficulty_id', table_name='puzzles')
@@ -3,6 +3,10 @@ from flask_restful import Resource, Api
 from config import Config
 from sudoku_api.database import db
 from sudoku_api.models.serializer import configure_marshmallow
+from sudoku_api.models.solver_model import configure_solver
+from sudoku_api.models.puzzle_pool import configure_puzzle_pool
+from sudoku_api.metrics import configure_metrics
+from sudoku_api.commands import configure_commands
 
 
 class HelloWorld(Resource):
@@ -22,13 +26,19 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
     db.init_app(app)
     configure_marshmallow(app)
+    configure_solver(app)
+    configure_puzzle_pool(app)
+    configure_metrics(app)
+    configure_commands(app)
 
-    from sudoku_api.controllers.solver_controller import Solver
-    from sudoku_api.controllers.puzzles_controller import Puzzle
+    from sudoku_api.controllers.solver_controller import Solver, SolverBatch
+    from sudoku_api.controllers.puzzles_controller import Puzzle, FreshPuzzle
 
     api = Api(app)
     api.add_resource(HelloWorld, '/')
     api.add_resource(Intro, '/api/')
     api.add_resource(Solver, '/api/solver')
+    api.add_resource(SolverBatch, '/api/solver/batch')
     api.add_resource(Puzzle, '/api/puzzles', '/api/puzzles/<int:puzzle_id>')
+    api.add_resource(FreshPuzzle, '/api/puzzles/fresh')
     return app
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from itertools import islice
+from typing import Optional
+import click
+from flask.cli import with_appcontext
+
+from sudoku_api.core.generator import iter_puzzles
+from sudoku_api.models.Puzzle import insert_puzzles
+from sudoku_api.models.puzzle_import import import_puzzles
+
+
+def configure_commands(app):
+    app.cli.add_command(generate_puzzles_command)
+    app.cli.add_command(import_puzzles_command)
+
+
+def read_checkpoint(path: Optional[str]) -> Optional[dict]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_checkpoint(path: str, checkpoint: dict) -> None:
+    # write to a temporary file first, so that an interruption never leaves a broken checkpoint behind
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+
+@click.command('generate-puzzles')
+@click.option('--count', '-n', type=click.IntRange(min=1), default=100, show_default=True,
+              help='Number of puzzles to generate.')
+@click.option('--size', type=click.Choice(['2x2', '3x3']), default='3x3', show_default=True,
+              help='Size of the squares of the puzzles.')
+@click.option('--min-difficulty', type=click.IntRange(min=0), default=0, show_default=True)
+@click.option('--max-difficulty', type=click.IntRange(min=0),
+              help='Upper bound of the difficulty. No bound if not given.')
+@click.option('--workers', type=click.IntRange(min=1), help='Number of processes. Defaults to the number of cores.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=500, show_default=True,
+              help='Number of puzzles inserted in one transaction.')
+@click.option('--seed', help='Master seed. The same seed and options give the same puzzles. Random if not given.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False),
+              help='File recording the progress after every batch. If it exists, the run it records is resumed.')
+@with_appcontext
+def generate_puzzles_command(count, size, min_difficulty, max_difficulty, workers, batch_size, seed, checkpoint):
+    """ Generate puzzles and insert them into the puzzles table as they are produced. """
+    if max_difficulty is not None and max_difficulty < min_difficulty:
+        raise click.BadParameter('must not be below --min-difficulty.', param_hint='--max-difficulty')
+    run = {'count': count, 'size': size, 'min_difficulty': min_difficulty, 'max_difficulty': max_difficulty,
+           'seed': seed or os.urandom(16).hex(), 'next_index': 0}
+    saved = read_checkpoint(checkpoint)
+    if saved:
+        mismatched = [key for key in ('count', 'size', 'min_difficulty', 'max_difficulty')
+                      if saved[key] != run[key]] + (['seed'] if seed and seed != saved['seed'] else [])
+        if mismatched:
+            raise click.UsageError(
+                f"The checkpoint {checkpoint} was made with a different {', '.join(mismatched)}.")
+        run = saved
+        click.echo(f"Resuming from puzzle {run['next_index']} of {count}.", err=True)
+
+    width = int(size[0])
+    if max_difficulty is None:
+        target_difficulty = max(400, min_difficulty + 50)
+    else:
+        target_difficulty = (min_difficulty + max_difficulty) // 2
+    puzzles = iter_puzzles(count, run['seed'], start=run['next_index'], width=width,
+                           target_difficulty=target_difficulty, min_difficulty=min_difficulty,
+                           max_difficulty=max_difficulty, workers=workers)
+
+    start = time.perf_counter()
+    done = 0
+    while batch := list(islice(puzzles, batch_size)):
+        # a batch inserted again after an interruption changes nothing, as the same puzzles are already there
+        insert_puzzles([{'puzzle': puzzle, 'solution': solution, 'difficulty': score, 'size': size}
+                        for (puzzle, solution, score) in batch])
+        done += len(batch)
+        run['next_index'] += len(batch)
+        if checkpoint:
+            write_checkpoint(checkpoint, run)
+        rate = done / (time.perf_counter() - start)
+        click.echo(f"{run['next_index']}/{count} puzzles, {rate:.1f} puzzles/s", err=True)
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    click.echo(f'Generated {done} puzzles with seed {run["seed"]}.')
+
+
+@click.command('import-puzzles')
+@click.argument('file', type=click.File('r'))
+@click.option('--batch-size', type=click.IntRange(min=1), default=1000, show_default=True,
+              help='Number of puzzles inserted in one transaction.')
+@with_appcontext
+def import_puzzles_command(file, batch_size):
+    """ Import puzzles from a JSON array or newline-delimited JSON FILE, such as db/seeds.json. Use - for stdin.
+        Puzzles already in the database get the difficulty and solution of the file. """
+    read = 0
+    imported: Optional[int] = 0
+    try:
+        for (batch_read, batch_imported) in import_puzzles(file, batch_size):
+            read += batch_read
+            # the count is unknown as soon as the database does not tell it for one batch
+            imported = None if imported is None or batch_imported is None else imported + batch_imported
+            click.echo(f'{read} puzzles read', err=True)
+    except ValueError as e:
+        raise click.ClickException(
+            f'{e} The {read} puzzles read before it were committed, {count_of(imported)} of them new or changed.')
+    click.echo(f'Imported {count_of(imported)} new or changed puzzles out of {read}.')
+
+
+def count_of(imported: Optional[int]) -> str:
+    return 'an unknown number of' if imported is None else str(imported)
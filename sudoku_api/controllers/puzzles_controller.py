@@ -1,9 +1,9 @@
 from typing import Dict, Optional, Any
-from flask import request, abort
+from flask import request, abort, current_app
 from flask_restful import Resource
-from marshmallow import Schema, fields, validate, ValidationError
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
 
-from sudoku_api.models.Puzzle import get_puzzles, get_puzzle_by_id
+from sudoku_api.models.Puzzle import get_puzzles, get_puzzle_by_id, decode_cursor
 
 
 class Puzzle(Resource):
@@ -17,8 +17,31 @@ class Puzzle(Resource):
                 abort(400, str(errors))
 
             kwargs = request.args.to_dict()
-            (puzzles, total_count) = get_puzzles(**kwargs)
-            return {"puzzles": puzzles, "total_count": total_count}
+            (puzzles, total_count, next_cursor) = get_puzzles(**kwargs)
+            return {"puzzles": puzzles, "total_count": total_count, "next_cursor": next_cursor}
+
+
+class FreshPuzzle(Resource):
+    def get(self):
+        errors = fresh_puzzle_query_schema.validate(request.args)
+        if errors:
+            abort(400, str(errors))
+
+        query = fresh_puzzle_query_schema.load(request.args)
+        min_difficulty = query.get('min_difficulty', 0)
+        max_difficulty = query.get('max_difficulty')
+        pool = current_app.extensions['puzzle_pool']
+        if not pool.covers(min_difficulty, max_difficulty):
+            abort(404, 'No fresh puzzles are kept for this difficulty. '
+                  f"Ask for a difficulty within {', '.join(f'{low}-{high}' for (low, high, _) in pool.buckets)}.")
+        pool.start()
+        puzzle = pool.take(min_difficulty, max_difficulty)
+        if puzzle is None:
+            # the refill thread has been woken up, and fills the buckets, or aims at this difficulty, within seconds
+            return ({"message": "No fresh puzzle of this difficulty is ready. Please try again later."},
+                    503, {'Retry-After': 1})
+        (puzzle, solution, score) = puzzle
+        return {"puzzle": {"puzzle": puzzle, "solution": solution, "difficulty": score, "size": pool.size}}
 
 
 def is_valid_puzzle_size(size: str):
@@ -37,14 +60,39 @@ class PuzzleQuerySchema(Schema):
     max_difficulty = fields.Int(validate=validate.Range(
         min=0, max=1000, error="Difficulty must be between 0 and 1000."))
     size = fields.Str(validate=is_valid_puzzle_size)
-    limit = fields.Int(validate=validate.Range(
-        min=10, error="Must be 10 or above."))
+    limit = fields.Int(validate=[
+        validate.Range(min=10, error="Must be 10 or above."),
+        validate.Range(max=100, error="Must be 100 or below.")])
     offset = fields.Int(validate=validate.Range(
         min=0, error="Must be 0 or above."))
     sort_by = fields.Str(validate=validate.OneOf(
         ["id", "difficulty"], error="Can only sort by either id or difficulty."))
     order = fields.Str(validate=validate.OneOf(
         ["asc", "desc"], error="Can only accept order of asc or desc."))
+    cursor = fields.Str()
+
+    @validates_schema
+    def validate_cursor(self, data, **kwargs):
+        if 'cursor' not in data:
+            return
+        try:
+            values = decode_cursor(data['cursor'])
+        except ValueError:
+            raise ValidationError("Not a valid cursor.", 'cursor')
+        # the cursor of a page sorted by difficulty has the difficulty and the id of its last puzzle
+        if len(values) != (2 if data.get('sort_by') == 'difficulty' else 1):
+            raise ValidationError(
+                "Not a valid cursor for this sort_by.", 'cursor')
 
 
 puzzle_query_schema = PuzzleQuerySchema()
+
+
+class FreshPuzzleQuerySchema(Schema):
+    min_difficulty = fields.Int(validate=validate.Range(
+        min=0, max=1000, error="Difficulty must be between 0 and 1000."))
+    max_difficulty = fields.Int(validate=validate.Range(
+        min=0, max=1000, error="Difficulty must be between 0 and 1000."))
+
+
+fresh_puzzle_query_schema = FreshPuzzleQuerySchema()
@@ -1,10 +1,15 @@
-from flask import request, abort, make_response
+import json
+from dataclasses import asdict
+from concurrent.futures.process import BrokenProcessPool
+from flask import request, abort, make_response, current_app
 from flask_restful import Resource
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate, validates, validates_schema, ValidationError
 from result import Ok, Err
 
-from sudoku_api.models.solver_model import solve_puzzle
+from sudoku_api.models.solver_model import solve_puzzle, solve_puzzle_with_stats, solve_puzzles
 from sudoku_api.core.display import display_grid
+from sudoku_api.core.sudoku import SOLVER_METHODS, SEARCH_LIMIT_EXCEEDED
+from sudoku_api.metrics import SOLVER_OUTCOMES, record_solver_outcome
 
 
 class Solver(Resource):
@@ -13,6 +18,7 @@ class Solver(Resource):
 
     def post(self):
         if not request.get_json() and not request.form:
+            SOLVER_OUTCOMES.labels('invalid').inc()
             return {"message": {
                 'puzzle': ['Missing data for required field.']}}, 400
 
@@ -22,31 +28,153 @@ class Solver(Resource):
 
         errors = solver_request_schema.validate(body)
         if errors:
+            SOLVER_OUTCOMES.labels('invalid').inc()
             abort(400, errors)
 
         body = solver_request_schema.load(body)
 
         puzzle = body.get('puzzle')
         display_as_grid = body.get('display_as_grid')
-        result = solve_puzzle(puzzle)
-        match result:
-            case Ok(solutions):
-                if len(solutions) == 1:
-                    if display_as_grid:
-                        res = make_response(display_grid(solutions[0]), 200)
-                        res.mimetype = 'text/plain'
-                        return res
-
-                    return {"solution": solutions[0]}
-                else:
-                    return {"solution": solutions[0], "alternative_solution": solutions[1], "message": "more than 1 solution found for given puzzle. only returning the first two solutions found."}
-            case Err(msg):
-                return {"message": msg}, 400
+        method = body.get('method', 'trail')
+        max_solutions = body.get('max_solutions')
+        include_difficulty = body.get('include_difficulty', False)
+        (time_limit, node_limit) = search_limits()
+        stats = None
+        if body.get('include_stats'):
+            (result, stats) = solve_puzzle_with_stats(puzzle, method=method, max_solutions=max_solutions or 2,
+                                                      time_limit=time_limit, node_limit=node_limit,
+                                                      include_difficulty=include_difficulty)
+        else:
+            result = solve_puzzle(puzzle, method=method, max_solutions=max_solutions or 2,
+                                  time_limit=time_limit, node_limit=node_limit, include_difficulty=include_difficulty)
+        headers = {'Server-Timing': stats.server_timing()} if stats else {}
+        found = result.map(lambda value: value[0]) if include_difficulty else result
+        match found:
+            case Ok(solutions) if len(solutions) == 1 and display_as_grid:
+                res = make_response(display_grid(solutions[0]), 200, headers)
+                res.mimetype = 'text/plain'
+                return res
+            case _:
+                (response, status) = format_result(
+                    result, max_solutions, include_difficulty)
+                if stats:
+                    response["stats"] = asdict(stats)
+                return (response, status, headers)
+
+
+class SolverBatch(Resource):
+    def post(self):
+        try:
+            if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+                items = [json.loads(line)
+                         for line in request.get_data(as_text=True).splitlines() if line.strip()]
+            else:
+                items = json.loads(request.get_data(as_text=True))
+        except ValueError:
+            abort(400, 'Request body must be a JSON array or newline-delimited JSON.')
+        if not isinstance(items, list) or not items:
+            abort(400, 'Request body must be a non-empty list of puzzles.')
+
+        batch_limit = current_app.config['SOLVER_BATCH_LIMIT']
+        if len(items) > batch_limit:
+            abort(400, f'Can only solve up to {batch_limit} puzzles in a batch.')
+
+        (time_limit, node_limit) = search_limits()
+        results: list = [None] * len(items)
+        to_solve = []
+        for (i, item) in enumerate(items):
+            if isinstance(item, str):
+                item = {"puzzle": item}
+            errors = solver_batch_request_schema.validate(item) if isinstance(
+                item, dict) else {'puzzle': ['Not a valid puzzle request.']}
+            if errors:
+                SOLVER_OUTCOMES.labels('invalid').inc()
+                results[i] = ({"message": errors}, 400)
+            else:
+                to_solve.append((i, dict(solver_batch_request_schema.load(item),
+                                         time_limit=time_limit, node_limit=node_limit)))
+
+        try:
+            solved = solve_puzzles([body for (_, body) in to_solve])
+        except BrokenProcessPool:
+            abort(503, 'Solver is temporarily unavailable. Please try again.')
+        for ((i, body), result) in zip(to_solve, solved):
+            results[i] = format_result(result, body.get(
+                'max_solutions'), body.get('include_difficulty', False))
+
+        return {"results": [dict(response, status=status) for (response, status) in results]}
+
+
+def search_limits():
+    """
+    return the time and node limits of a solve: the configured limits,
+    lowered by the X-Solver-Time-Limit and X-Solver-Node-Limit headers if given.
+    """
+    limits = []
+    for (header, config_key, convert) in [('X-Solver-Time-Limit', 'SOLVER_TIME_LIMIT', float),
+                                          ('X-Solver-Node-Limit', 'SOLVER_NODE_LIMIT', int)]:
+        limit = current_app.config.get(config_key)
+        if header in request.headers:
+            try:
+                requested = convert(request.headers[header])
+            except ValueError:
+                requested = -1
+            if not requested > 0:
+                abort(400, f'{header} must be a positive number.')
+            limit = requested if limit is None else min(limit, requested)
+        limits.append(limit)
+    return tuple(limits)
+
+
+def format_result(result, max_solutions=None, include_difficulty=False):
+    difficulty = None
+    if include_difficulty and result.is_ok():
+        # a result from the solution store has been through JSON, so the pair may be a list
+        (solutions, difficulty) = result.unwrap()
+        result = Ok(solutions)
+    record_solver_outcome(result)
+    match result:
+        case Ok(solutions):
+            if len(solutions) == 1:
+                response = {"solution": solutions[0]}
+            else:
+                number_found = 'two' if len(solutions) == 2 else len(solutions)
+                response = {"solution": solutions[0], "alternative_solution": solutions[1],
+                            "message": f"more than 1 solution found for given puzzle. only returning the first {number_found} solutions found."}
+            if max_solutions:
+                response["solutions"] = solutions
+            if include_difficulty:
+                response["difficulty"] = difficulty
+            return (response, 200)
+        case Err(msg) if msg == SEARCH_LIMIT_EXCEEDED:
+            return ({"message": "Gave up solving the puzzle as it took too long."}, 422)
+        case Err(msg):
+            return ({"message": msg}, 400)
 
 
 class SolverRequestSchema(Schema):
     puzzle = fields.Str(required=True)
     display_as_grid = fields.Bool()
+    method = fields.Str(validate=validate.OneOf(
+        SOLVER_METHODS, error=f"Can only solve by one of: {', '.join(SOLVER_METHODS)}."))
+    max_solutions = fields.Int(validate=validate.Range(
+        min=1, max=100, error="Must be between 1 and 100."))
+    include_stats = fields.Bool()
+    include_difficulty = fields.Bool()
+
+    @validates_schema
+    def validate_method(self, data, **kwargs):
+        # the difficulty is scored by a search of its own, which would silently replace the method
+        if data.get('include_difficulty') and 'method' in data:
+            raise ValidationError("Cannot be combined with include_difficulty.", 'method')
+
+
+class SolverBatchRequestSchema(SolverRequestSchema):
+    @validates('include_stats')
+    def validate_include_stats(self, value, **kwargs):
+        if value:
+            raise ValidationError("Not supported by the batch solver.")
 
 
 solver_request_schema = SolverRequestSchema()
+solver_batch_request_schema = SolverBatchRequestSchema()
@@ -0,0 +1,121 @@
+from typing import Iterable
+import numpy as np
+from sudoku_api.core.geometry import Geometry, get_geometry
+
+
+VALID = 0
+INVALID_LENGTH = 1
+INVALID_CHAR = 2
+DUPLICATED_NUMBER = 3
+
+
+def encode_puzzles(puzzles: Iterable[str], width: int = 3) -> tuple[np.ndarray, np.ndarray]:
+    """
+    pack puzzle strings into a 2D uint8 array of their ASCII codes, one row per puzzle.
+    rows are padded with 0 or truncated to the number of cells. the original lengths are returned alongside.
+    >>> (chars, lengths) = encode_puzzles(['1.34' * 4, '12'], width=2)
+    >>> lengths.tolist()
+    [16, 2]
+    >>> chars[0].tolist()
+    [49, 46, 51, 52, 49, 46, 51, 52, 49, 46, 51, 52, 49, 46, 51, 52]
+    >>> chars[1].tolist()
+    [49, 50, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+    """
+    number_of_cells = width ** 4
+    puzzles = list(puzzles)
+    lengths = np.fromiter((len(puzzle) for puzzle in puzzles),
+                          dtype=np.int64, count=len(puzzles))
+    encoded = b''.join(puzzle.encode('ascii', 'replace')[:number_of_cells].ljust(number_of_cells, b'\0')
+                       for puzzle in puzzles)
+    chars = np.frombuffer(encoded, dtype=np.uint8).reshape(
+        len(puzzles), number_of_cells)
+    return (chars, lengths)
+
+
+def to_digits(chars: np.ndarray) -> np.ndarray:
+    """
+    convert ASCII codes of a puzzle array into numbers, with 0 for empty cells ('.' or '0').
+    >>> to_digits(np.frombuffer(b'1.30', dtype=np.uint8)).tolist()
+    [1, 0, 3, 0]
+    """
+    digits = chars.astype(np.int32) - ord('0')
+    digits[chars == ord('.')] = 0
+    return digits
+
+
+def validate_puzzles(chars: np.ndarray, lengths: np.ndarray, width: int = 3) -> np.ndarray:
+    """
+    validate every puzzle in an encoded array at once, with the same checks as Sudoku.validate_puzzle_string.
+    return an array of status codes: VALID, INVALID_LENGTH, INVALID_CHAR or DUPLICATED_NUMBER.
+    >>> puzzles = ['..9..5.1.85.4....2432......1...69.83.9.....6.62.71...9......1945....4.37.4.3..6..',
+    ...            '..9..5.1.85.4....2432......1...69.83.9.....6.62.71...9......1945....4.37.4.3..6..1',
+    ...            'A.9..5.1.85.4...2432......1...69.83.9.....6.62.71...9......1945....4.37.4.3..6..1',
+    ...            'A23456789' + '0' * 72,
+    ...            '113456789' + '0' * 72,
+    ...            '1234567891' + '0' * 71,
+    ...            '1234567892' + '0' * 71]
+    >>> validate_puzzles(*encode_puzzles(puzzles)).tolist()
+    [0, 1, 2, 2, 3, 3, 3]
+
+    Only the digits 0-9 are numbers, as for Sudoku.parse_puzzle, even on grids with more than 9 numbers.
+    >>> from sudoku_api.core.sudoku import Sudoku
+    >>> puzzles16x16 = ['9' + '.' * 255, ':' + '.' * 255]
+    >>> validate_puzzles(*encode_puzzles(puzzles16x16, width=4), width=4).tolist()
+    [0, 2]
+    >>> [Sudoku(width=4).validate_puzzle_string(puzzle).is_ok() for puzzle in puzzles16x16]
+    [True, False]
+    """
+    geometry = get_geometry(width)
+    max_num = geometry.max_num
+    status = np.full(len(chars), VALID, dtype=np.uint8)
+
+    # the same chars as Sudoku.parse_puzzle accepts: '.' and the digits up to max_num
+    valid_chars = (chars == ord('.')) | (
+        (chars >= ord('0')) & (chars <= ord('0') + min(max_num, 9)))
+    in_units = np.sort(to_digits(chars)[:, np.array(geometry.units)], axis=2)
+    has_duplicates = ((in_units[:, :, 1:] == in_units[:, :, :-1]) & (
+        in_units[:, :, 1:] > 0)).any(axis=(1, 2))
+
+    status[has_duplicates] = DUPLICATED_NUMBER
+    status[~valid_chars.all(axis=1)] = INVALID_CHAR
+    status[lengths != geometry.number_of_cells] = INVALID_LENGTH
+    return status
+
+
+def unit_bits(digits: np.ndarray, geometry: Geometry) -> np.ndarray:
+    """
+    return the bit notation of numbers taken in each row/column/square, with shape (puzzles, units).
+    """
+    bits = np.where(digits > 0, 1 << (digits - 1).clip(0), 0)
+    return np.bitwise_or.reduce(bits[:, np.array(geometry.units)], axis=2)
+
+
+def candidate_masks(chars: np.ndarray, width: int = 3) -> np.ndarray:
+    """
+    compute the candidate grid of every puzzle at once, in the same representation as Sudoku.map_puzzle_to_grid:
+    bits of an empty cell mark the numbers that are NOT valid, and occupied cells are negative.
+    puzzles should be validated first.
+    >>> from sudoku_api.core.sudoku import Sudoku
+    >>> sudoku2x2 = Sudoku(width=2)
+    >>> puzzles = ['..3..4.22.4..1.3', '1234341223414123']
+    >>> masks = candidate_masks(encode_puzzles(puzzles, width=2)[0], width=2)
+    >>> masks.tolist() == [sudoku2x2.map_puzzle_to_grid(puzzle) for puzzle in puzzles]
+    True
+    """
+    geometry = get_geometry(width)
+    digits = to_digits(chars)
+    taken = unit_bits(digits, geometry)
+
+    cell_units = np.array(geometry.cell_units)
+    masks = taken[:, cell_units[:, 0]] | taken[:, cell_units[:, 1]] | taken[:, cell_units[:, 2]]
+    return np.where(digits > 0, -digits, masks)
+
+
+def has_dead_cell(masks: np.ndarray, width: int = 3) -> np.ndarray:
+    """
+    flag the puzzles having an empty cell which cannot fit any number.
+    >>> masks = candidate_masks(encode_puzzles(['123443123.....2.', '12..3412....4...'], width=2)[0], width=2)
+    >>> has_dead_cell(masks, width=2).tolist()
+    [True, False]
+    """
+    return (masks == get_geometry(width).full_mask).any(axis=1)
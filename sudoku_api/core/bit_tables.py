@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Sequence
+
+
+# tables are only built for masks of up to this many bits: 2 ** 12 entries of each.
+# larger geometries (16x16 and up) compute the same values on every lookup instead.
+MAX_TABLE_BITS = 12
+
+
+class ComputedTable():
+    """ a read-only stand-in for a table which is too large to build, computing each entry when indexed.
+    >>> table = ComputedTable(lambda mask: mask * 2)
+    >>> table[21]
+    42
+    """
+
+    def __init__(self, compute: Callable[[int], object]):
+        self.compute = compute
+
+    def __getitem__(self, mask: int):
+        return self.compute(mask)
+
+
+def mask_to_numbers(mask: int) -> tuple[int, ...]:
+    """
+    the numbers whose bits are set in a mask, in ascending order
+    >>> mask_to_numbers(0b1001010)
+    (2, 4, 7)
+    """
+    numbers = []
+    number = 1
+    while mask:
+        if mask & 1:
+            numbers.append(number)
+        number += 1
+        mask >>= 1
+    return tuple(numbers)
+
+
+@dataclass(frozen=True)
+class BitTables():
+    """ lookup tables indexed by a candidate mask, where a set bit means a number is NOT valid for a cell:
+        popcount    the number of bits set, i.e. numbers excluded
+        numbers     the excluded numbers
+        available   the numbers still valid
+    """
+    max_num: int
+    popcount: Sequence[int]
+    numbers: Sequence[tuple[int, ...]]
+    available: Sequence[tuple[int, ...]]
+
+
+@lru_cache(maxsize=None)
+def get_bit_tables(max_num: int) -> BitTables:
+    """
+    return the (shared, immutable) tables for masks of max_num bits.
+    >>> tables = get_bit_tables(9)
+    >>> (tables.popcount[50], tables.numbers[50], tables.available[50])
+    (3, (2, 5, 6), (1, 3, 4, 7, 8, 9))
+    >>> get_bit_tables(9) is tables
+    True
+    >>> isinstance(tables.available, tuple)
+    True
+
+    Large geometries get computed tables with the same values.
+    >>> tables = get_bit_tables(16)
+    >>> (tables.popcount[50], tables.numbers[50], tables.available[50][:6])
+    (3, (2, 5, 6), (1, 3, 4, 7, 8, 9))
+    >>> isinstance(tables.available, tuple)
+    False
+    """
+    full_mask = 2 ** max_num - 1
+    available = (lambda mask: mask_to_numbers(full_mask ^ mask))
+    if max_num > MAX_TABLE_BITS:
+        return BitTables(max_num, ComputedTable(int.bit_count), ComputedTable(mask_to_numbers),
+                         ComputedTable(available))
+    masks = range(full_mask + 1)
+    return BitTables(max_num,
+                     tuple(mask.bit_count() for mask in masks),
+                     tuple(mask_to_numbers(mask) for mask in masks),
+                     tuple(available(mask) for mask in masks))
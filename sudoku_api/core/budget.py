@@ -0,0 +1,47 @@
+import time
+from typing import Optional
+
+
+class SearchAborted(Exception):
+    """ raised inside a search when its SearchBudget runs out """
+
+
+class SearchBudget():
+    def __init__(self, time_limit: Optional[float] = None, node_limit: Optional[int] = None):
+        """ a wall-clock deadline and/or a limit of search nodes for one solve.
+            tick() is called at every node of a search, and raises SearchAborted once either limit is exceeded.
+            the clock is only read every 64 nodes, as it costs more than the rest of tick().
+
+        >>> budget = SearchBudget(node_limit=2)
+        >>> budget.tick()
+        >>> budget.tick()
+        >>> budget.tick()
+        Traceback (most recent call last):
+        ...
+        sudoku_api.core.budget.SearchAborted: node limit of 2 exceeded
+        >>> budget = SearchBudget(time_limit=0)
+        >>> for _ in range(64):
+        ...     budget.tick()
+        Traceback (most recent call last):
+        ...
+        sudoku_api.core.budget.SearchAborted: time limit of 0 seconds exceeded
+
+        An unlimited budget only counts the nodes.
+        >>> budget = SearchBudget()
+        >>> for _ in range(1000):
+        ...     budget.tick()
+        >>> budget.nodes
+        1000
+        """
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        self.nodes = 0
+
+    def tick(self) -> None:
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchAborted(f'node limit of {self.node_limit} exceeded')
+        if self.deadline is not None and self.nodes & 63 == 0 and time.monotonic() > self.deadline:
+            raise SearchAborted(
+                f'time limit of {self.time_limit} seconds exceeded')
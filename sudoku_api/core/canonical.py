@@ -0,0 +1,230 @@
+import itertools
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Transform():
+    """ a symmetry of sudoku, mapping a puzzle to its canonical form.
+        the canonical cell at (r, c) is relabel[p[rows[r]][columns[c]]], where p is the puzzle, transposed first if transpose is True.
+        relabel[0] is always 0, so empty cells stay empty.
+
+    >>> transform = Transform(width=2, transpose=True, rows=(1, 0, 2, 3), columns=(0, 1, 3, 2), relabel=(0, 2, 1, 3, 4))
+    >>> transform.apply('1234341223414123')
+    '1423234132144132'
+    >>> transform.revert('1423234132144132')
+    '1234341223414123'
+    """
+    width: int
+    transpose: bool
+    rows: Tuple[int, ...]
+    columns: Tuple[int, ...]
+    relabel: Tuple[int, ...]
+
+    def apply(self, puzzle: str) -> str:
+        """ map a puzzle (or its solution) to the canonical frame """
+        grid = to_rows(puzzle, self.width, self.transpose)
+        return ''.join(str(self.relabel[grid[r][c]]) for r in self.rows for c in self.columns)
+
+    def revert(self, puzzle: str) -> str:
+        """ map a puzzle (or its solution) in the canonical frame back to the original frame """
+        max_num = self.width ** 2
+        inverse = [0] * (max_num + 1)
+        for (digit, label) in enumerate(self.relabel):
+            inverse[label] = digit
+        grid = to_rows(puzzle, self.width)
+        original = [[0] * max_num for _ in range(max_num)]
+        for (r, row) in enumerate(self.rows):
+            for (c, column) in enumerate(self.columns):
+                original[row][column] = inverse[grid[r][c]]
+        if self.transpose:
+            original = [list(column) for column in zip(*original)]
+        return ''.join(str(digit) for row in original for digit in row)
+
+
+def to_rows(puzzle: str, width: int, transpose: bool = False) -> list[list[int]]:
+    """
+    convert a puzzle string to a list of rows of numbers, with 0 for empty cells
+    >>> to_rows('12.4' + '0' * 12, 2)
+    [[1, 2, 0, 4], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+    >>> to_rows('12.4' + '0' * 12, 2, transpose=True)[0]
+    [1, 0, 0, 0]
+    """
+    max_num = width ** 2
+    if len(puzzle) != max_num ** 2:
+        raise ValueError(
+            'the length of puzzle string does not match the required size')
+    digits = [0 if char == '.' else int(char) for char in puzzle]
+    rows = [digits[i: i + max_num] for i in range(0, len(digits), max_num)]
+    if transpose:
+        rows = [list(column) for column in zip(*rows)]
+    return rows
+
+
+def canonicalize(puzzle: str, width: int = 3) -> Tuple[str, Transform]:
+    """
+    find the canonical form of a puzzle under the symmetries of sudoku:
+    relabelling numbers, permuting bands/stacks, permuting rows/columns within a band/stack, and transposing.
+    the canonical form is the lexicographically smallest string among all equivalent puzzles, with empty cells as 0.
+    return the canonical string, and the Transform from the puzzle to it.
+
+    >>> puzzle = "000000270008270045040000008000567010005009007000040000200000401900010000650304792"
+    >>> (canonical, transform) = canonicalize(puzzle)
+    >>> canonical
+    '000000001000002345003040060000704000008031704010080000530476910600000002700120000'
+    >>> transform.apply(puzzle) == canonical
+    True
+    >>> transform.revert(canonical) == puzzle
+    True
+
+    Equivalent puzzles have the same canonical form.
+    >>> relabelled = puzzle.translate(str.maketrans('123456789', '912345678'))
+    >>> transposed = ''.join(puzzle[c * 9 + r] for r in range(9) for c in range(9))
+    >>> shuffled = Transform(3, False, (5, 3, 4, 8, 7, 6, 1, 0, 2), (2, 0, 1, 6, 8, 7, 3, 5, 4), tuple(range(10))).apply(puzzle)
+    >>> all(canonicalize(p)[0] == canonical for p in [relabelled, transposed, shuffled])
+    True
+
+    A solution of the canonical puzzle can be mapped back to a solution of the original one.
+    >>> solution = "516438279398276145742951368823567914465129837179843526237695481984712653651384792"
+    >>> transform.revert(transform.apply(solution)) == solution
+    True
+
+    Completely filled grids have canonical forms too.
+    >>> canonicalize(solution)[0]
+    '123456789456789231789132546238961457517248963964573128391824675672395814845617392'
+    >>> canonicalize('.' * 81)[0] == '0' * 81
+    True
+    >>> canonicalize('1234341223414123', width=2)[0]
+    '1234341223414123'
+
+    The search goes through every transposition and order of the columns at once, a row at a time,
+    so its time is bounded whatever the puzzle, rather than growing with the number of ties between rows.
+    """
+    max_num = width ** 2
+    base = max_num + 1
+    orders = column_orders(width)
+    # a frame is a transposition and an order of the columns. the rows are then chosen one at a time, for every
+    # frame at once, keeping only the choices which give the smallest row so far.
+    framed = np.concatenate([np.array(to_rows(puzzle, width, transpose), dtype=np.int8)[:, orders].transpose(1, 0, 2)
+                             for transpose in (False, True)])
+    # frames giving the same grid, such as orders of empty columns, are interchangeable
+    seen: dict = {}
+    for (f, grid) in enumerate(framed):
+        seen.setdefault(grid.tobytes(), f)
+    first_frame = np.array(list(seen.values()))
+    frames = framed[first_frame]
+    transposed = first_frame >= len(orders)
+    empty_rows = [tuple(not any(row) for row in to_rows(puzzle, width, transpose)) for transpose in (False, True)]
+
+    # the state of every partial form: its frame, the rows chosen, and the label of every number (0 if not labelled)
+    frame = np.arange(len(frames))
+    rows = np.zeros((len(frames), 0), dtype=np.int64)
+    labels = np.zeros((len(frames), base), dtype=np.int8)
+    for _ in range(max_num):
+        (group, member) = np.unique(transposed[frame] * (1 << max_num) + bitmask(rows), return_inverse=True)
+        (extended, row) = ([], [])
+        for (g, group_key) in enumerate(group.tolist()):
+            members = (member == g).nonzero()[0]
+            next_rows = candidate_rows(empty_rows[group_key >> max_num], group_key & ((1 << max_num) - 1), width)
+            extended.append(np.repeat(members, len(next_rows)))
+            row.append(np.tile(next_rows, len(members)))
+        (extended, row) = (np.concatenate(extended), np.concatenate(row))
+
+        (key, row_labels) = relabel_rows(frames[frame[extended], row], labels[extended])
+        kept = (key == key.min()).nonzero()[0]
+        (frame, rows, labels) = (frame[extended[kept]],
+                                 np.column_stack([rows[extended[kept]], row[kept]]),
+                                 row_labels[kept])
+        # forms with the same frame, rows and labels have the same future, whatever the order of their rows
+        state = (frame * (1 << max_num) + bitmask(rows)) * base ** max_num + labels[:, 1:] @ base ** np.arange(max_num, dtype=np.int64)
+        (_, unique) = np.unique(state, return_index=True)
+        (frame, rows, labels) = (frame[unique], rows[unique], labels[unique])
+
+    first = first_frame[frame[0]]
+    used_labels = labels[0]
+    unused_labels = iter(sorted(set(range(1, base)) - set(used_labels.tolist())))
+    relabel = tuple([0] + [int(label) if label else next(unused_labels) for label in used_labels[1:]])
+    transform = Transform(width, bool(transposed[frame[0]]), tuple(rows[0].tolist()),
+                          tuple(orders[first % len(orders)].tolist()), relabel)
+    return (transform.apply(puzzle), transform)
+
+
+@lru_cache(maxsize=None)
+def column_orders(width: int) -> np.ndarray:
+    """
+    every order of the columns which keeps the columns of a stack together
+    >>> column_orders(2).tolist()
+    [[0, 1, 2, 3], [0, 1, 3, 2], [1, 0, 2, 3], [1, 0, 3, 2], [2, 3, 0, 1], [2, 3, 1, 0], [3, 2, 0, 1], [3, 2, 1, 0]]
+    """
+    within = list(itertools.permutations(range(width)))
+    return np.array([[stack * width + column for (stack, order) in zip(stacks, orders) for column in order]
+                     for stacks in itertools.permutations(range(width))
+                     for orders in itertools.product(within, repeat=width)])
+
+
+def bitmask(rows: np.ndarray) -> np.ndarray:
+    """ the set of rows chosen by every partial form, as a bit mask """
+    return (1 << rows).sum(axis=1)
+
+
+@lru_cache(maxsize=4096)
+def candidate_rows(empty_rows: Tuple[bool, ...], chosen: int, width: int) -> Tuple[int, ...]:
+    """
+    the rows which may come next after the chosen ones, given as a bit mask,
+    skipping empty rows and bands which are interchangeable with one already given.
+    >>> candidate_rows((False,) * 4, 0b0100, 2)
+    (3,)
+    >>> candidate_rows((False, True, True, True), 0, 2)
+    (0, 1, 2)
+    """
+    bands = [range(band * width, (band + 1) * width) for band in range(width)]
+    started = [band for band in bands if 0 < sum(chosen >> r & 1 for r in band) < width]
+    if started:
+        choices = [r for r in started[0] if not chosen >> r & 1]
+    else:
+        choices = []
+        empty_band_seen = False
+        for band in bands:
+            if chosen >> band[0] & 1:
+                continue
+            if all(empty_rows[r] for r in band):
+                if empty_band_seen:
+                    continue
+                empty_band_seen = True
+            choices += band
+    empty_row_seen = set()
+    candidates = []
+    for r in choices:
+        if empty_rows[r]:
+            if r // width in empty_row_seen:
+                continue
+            empty_row_seen.add(r // width)
+        candidates.append(r)
+    return tuple(candidates)
+
+
+def relabel_rows(values: np.ndarray, labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    read rows given in the order of their frame, labelling the numbers not seen before in order of appearance.
+    return every relabelled row packed into a number which compares like the row, and the labels after it.
+    >>> (key, labels) = relabel_rows(np.array([[0, 3, 1, 3]]), np.array([[0, 0, 1, 0, 0]]))
+    >>> labels.tolist()
+    [[0, 3, 1, 2, 0]]
+    >>> key.tolist() == [((0 * 5 + 2) * 5 + 3) * 5 + 2]
+    True
+    """
+    (number, base) = labels.shape
+    labels = labels.ravel().copy()
+    assigned = (labels.reshape(number, base) > 0).sum(axis=1, dtype=labels.dtype)
+    offsets = np.arange(0, number * base, base)
+    key = np.zeros(number, dtype=np.int64)
+    for v in values.T:
+        cells = offsets + v
+        new = ((v > 0) & (labels[cells] == 0)).nonzero()[0]
+        assigned[new] += 1
+        labels[cells[new]] = assigned[new]
+        key *= base
+        key += labels[cells]
+    return (key, labels.reshape(number, base))
@@ -0,0 +1,153 @@
+from typing import Iterable, Optional
+from sudoku_api.core.budget import SearchBudget
+from sudoku_api.core.stats import SearchStats
+
+
+class ExactCover():
+    def __init__(self, number_of_columns: int):
+        """ an exact cover matrix solved by Knuth's Algorithm X with dancing links.
+            links are kept in flat lists indexed by node number:
+            node 0 is the root, nodes 1..number_of_columns are column headers, the rest are the 1s of each row.
+
+        Knuth's example from the Dancing Links paper:
+        >>> matrix = ExactCover(7)
+        >>> [matrix.add_row(row) for row in [[2, 4, 5], [0, 3, 6], [1, 2, 5], [0, 3], [1, 6], [3, 4, 6]]]
+        [0, 1, 2, 3, 4, 5]
+        >>> matrix.solve()
+        [[0, 3, 4]]
+
+        Stop after the given number of solutions.
+        >>> matrix = ExactCover(2)
+        >>> [matrix.add_row(row) for row in [[0], [1], [0, 1]]]
+        [0, 1, 2]
+        >>> matrix.solve(max_solutions=5)
+        [[0, 1], [2]]
+        >>> matrix.solve(max_solutions=1)
+        [[0, 1]]
+        """
+        self.number_of_columns = number_of_columns
+        headers = range(number_of_columns + 1)
+        self.left = [i - 1 for i in headers]
+        self.left[0] = number_of_columns
+        self.right = [i + 1 for i in headers]
+        self.right[number_of_columns] = 0
+        self.up = list(headers)
+        self.down = list(headers)
+        self.column = list(headers)
+        self.size = [0 for _ in headers]
+        self.row_of = [-1 for _ in headers]
+        self.number_of_rows = 0
+
+    def add_row(self, columns: Iterable[int]) -> int:
+        """ append a row with 1s in the given (0-based) columns, and return the row number """
+        row = self.number_of_rows
+        self.number_of_rows += 1
+        first = None
+        for col in columns:
+            header = col + 1
+            node = len(self.column)
+            self.column.append(header)
+            self.row_of.append(row)
+            # insert at the bottom of the column
+            self.up.append(self.up[header])
+            self.down.append(header)
+            self.down[self.up[header]] = node
+            self.up[header] = node
+            self.size[header] += 1
+            # insert at the end of the row
+            if first is None:
+                first = node
+                self.left.append(node)
+                self.right.append(node)
+            else:
+                self.left.append(self.left[first])
+                self.right.append(first)
+                self.right[self.left[first]] = node
+                self.left[first] = node
+        return row
+
+    def cover(self, header: int) -> None:
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        i = down[header]
+        while i != header:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, header: int) -> None:
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[header]
+        while i != header:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def solve(self, max_solutions: int = 2, budget: Optional[SearchBudget] = None,
+              stats: Optional[SearchStats] = None) -> list[list[int]]:
+        """ return up to max_solutions exact covers, each as a sorted list of row numbers.
+            the search ticks the given budget at every node, which may raise SearchAborted,
+            and counts backtracks and depth in the given stats.
+        """
+        solutions: list[list[int]] = []
+        self.budget = budget or SearchBudget()
+        self.stats = stats or SearchStats()
+        self.search([], solutions, max_solutions)
+        return solutions
+
+    def search(self, chosen: list[int], solutions: list[list[int]], max_solutions: int) -> None:
+        self.budget.tick()
+        self.stats.reach(len(chosen))
+        right, down, size = self.right, self.down, self.size
+        if right[0] == 0:
+            # every column is covered. i.e. a solution is found.
+            solutions.append(sorted(self.row_of[node] for node in chosen))
+            return
+
+        # pick the column with fewest rows left
+        header = 0
+        fewest = None
+        col = right[0]
+        while col != 0:
+            if fewest is None or size[col] < fewest:
+                header = col
+                fewest = size[col]
+                if fewest <= 1:
+                    break
+            col = right[col]
+        if fewest == 0:
+            # a column which cannot be covered by any row. backtrack.
+            self.stats.backtracks += 1
+            return
+
+        self.cover(header)
+        node = down[header]
+        while node != header:
+            chosen.append(node)
+            j = right[node]
+            while j != node:
+                self.cover(self.column[j])
+                j = right[j]
+
+            self.search(chosen, solutions, max_solutions)
+
+            j = self.left[node]
+            while j != node:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            chosen.pop()
+            if len(solutions) >= max_solutions:
+                break
+            node = down[node]
+        self.uncover(header)
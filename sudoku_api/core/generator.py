@@ -0,0 +1,73 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Tuple
+from sudoku_api.core.sudoku import Sudoku
+
+
+def derive_seed(master_seed, index: int) -> str:
+    """
+    the seed of the index-th puzzle generated from a master seed.
+    it only depends on the two, so every puzzle can be generated on its own, in any process and in any order.
+    >>> derive_seed('catalog', 0)
+    '105c85a073d9b1405d7be9352a8e9f35017903e490d70637c9b1130204543305'
+    >>> derive_seed('catalog', 0) == derive_seed('catalog', 1)
+    False
+    """
+    return hashlib.sha256(f'{master_seed}:{index}'.encode()).hexdigest()
+
+
+def generate_one(task: tuple) -> Tuple[str, str, int]:
+    (seed, width, height, target_difficulty, min_difficulty, max_difficulty) = task
+    return Sudoku(width=width, height=height).generate_puzzle(
+        seed, target_difficulty=target_difficulty, min_difficulty=min_difficulty, max_difficulty=max_difficulty)
+
+
+def iter_puzzles(number: int, master_seed, start: int = 0, width: int = 3, height: Optional[int] = None,
+                 target_difficulty: int = 400, min_difficulty: int = 0, max_difficulty: Optional[int] = None,
+                 workers: Optional[int] = None) -> Iterator[Tuple[str, str, int]]:
+    """
+    yield the puzzles from index start up to number generated from a master seed, in order, as they are produced.
+    at most a few puzzles per worker are in flight at once, so memory does not grow with number.
+    as every puzzle has its own seed, starting at an index gives the same puzzles as the rest of a run from 0.
+    >>> puzzles = list(iter_puzzles(3, 'test', width=2, workers=1))
+    >>> list(iter_puzzles(3, 'test', start=1, width=2, workers=2)) == puzzles[1:]
+    True
+    """
+    tasks = ((derive_seed(master_seed, i), width, height or width, target_difficulty, min_difficulty, max_difficulty)
+             for i in range(start, number))
+    workers = min(workers or os.cpu_count() or 1, max(number - start, 1))
+    if workers == 1:
+        yield from map(generate_one, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = deque(executor.submit(generate_one, task)
+                       for (_, task) in zip(range(workers * 4), tasks))
+        while window:
+            puzzle = window.popleft().result()
+            task = next(tasks, None)
+            if task is not None:
+                window.append(executor.submit(generate_one, task))
+            yield puzzle
+
+
+def generate_puzzles(number: int, master_seed=None, width: int = 3, height: Optional[int] = None,
+                     target_difficulty: int = 400, min_difficulty: int = 0,
+                     workers: Optional[int] = None) -> list[Tuple[str, str, int]]:
+    """
+    generate puzzles across a pool of worker processes, each puzzle from its own seed derived from master_seed.
+    the puzzles are returned in order, and are the same for a master seed whatever the number of workers.
+    without a master seed, a random one is used.
+    >>> generate_puzzles(3, 'test', width=2, workers=1) == generate_puzzles(3, 'test', width=2, workers=2)
+    True
+    >>> generate_puzzles(1, 'test', width=2)
+    [('0040010000300300', '3241412314322314', 12)]
+    """
+    if number < 1:
+        return []
+    if master_seed is None:
+        master_seed = os.urandom(16).hex()
+    return list(iter_puzzles(number, master_seed, width=width, height=height, target_difficulty=target_difficulty,
+                             min_difficulty=min_difficulty, workers=workers))
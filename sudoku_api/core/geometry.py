@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@dataclass(frozen=True)
+class Geometry():
+    """ immutable index tables describing the layout of a sudoku grid.
+        built once per (width, height) by get_geometry and shared by every Sudoku instance.
+
+    >>> geometry = get_geometry(2)
+    >>> geometry.max_num, geometry.number_of_cells
+    (4, 16)
+    >>> geometry.rows[0], geometry.columns[0], geometry.squares[0]
+    ((0, 1, 2, 3), (0, 4, 8, 12), (0, 1, 4, 5))
+    >>> geometry.peers[0]
+    (1, 2, 3, 4, 5, 8, 12)
+    >>> geometry.cell_units[6]
+    (1, 6, 9)
+    >>> bin(geometry.unit_masks[8])
+    '0b110011'
+    """
+    width: int
+    height: int
+    max_num: int
+    number_of_cells: int
+    full_mask: int
+    rows: tuple[tuple[int, ...], ...]
+    columns: tuple[tuple[int, ...], ...]
+    squares: tuple[tuple[int, ...], ...]
+    units: tuple[tuple[int, ...], ...]
+    unit_masks: tuple[int, ...]
+    cell_units: tuple[tuple[int, int, int], ...]
+    peers: tuple[tuple[int, ...], ...]
+
+
+def get_geometry(width: int = 3, height: int | None = None) -> Geometry:
+    """ return the shared Geometry of a sudoku with the given square width.
+
+    The same object is returned for the same size.
+    >>> get_geometry(3) is get_geometry(3, 3)
+    True
+    >>> len(get_geometry(3).units)
+    27
+    >>> all(len(peers) == 20 for peers in get_geometry(3).peers)
+    True
+    """
+    return _build_geometry(width, height or width)
+
+
+@lru_cache(maxsize=None)
+def _build_geometry(width: int, height: int) -> Geometry:
+    max_num = width ** 2
+    number_of_cells = max_num ** 2
+
+    rows = tuple(tuple(range(r * max_num, (r + 1) * max_num))
+                 for r in range(max_num))
+    columns = tuple(tuple(range(c, number_of_cells, max_num))
+                    for c in range(max_num))
+    squares = []
+    for n in range(max_num):
+        start = (n // width) * width ** 3 + (n % width) * width
+        squares.append(tuple(start + i * max_num + j
+                             for i in range(width) for j in range(width)))
+    squares = tuple(squares)
+    units = rows + columns + squares
+
+    cell_units = []
+    peers = []
+    for idx in range(number_of_cells):
+        r = idx // max_num
+        c = idx % max_num
+        s = (r // width) * width + c // width
+        cell_units.append((r, max_num + c, 2 * max_num + s))
+        same_unit = set(rows[r]) | set(columns[c]) | set(squares[s])
+        same_unit.discard(idx)
+        peers.append(tuple(sorted(same_unit)))
+
+    return Geometry(width=width, height=height, max_num=max_num, number_of_cells=number_of_cells,
+                    full_mask=2 ** max_num - 1, rows=rows, columns=columns, squares=squares,
+                    units=units, unit_masks=tuple(sum(1 << idx for idx in unit) for unit in units),
+                    cell_units=tuple(cell_units), peers=tuple(peers))
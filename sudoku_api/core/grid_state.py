@@ -0,0 +1,270 @@
+from typing import Optional, Tuple
+from sudoku_api.core.geometry import Geometry
+
+
+class GridState():
+    def __init__(self, geometry: Geometry, grid: list[int]):
+        """ a candidate grid which is updated in place while searching.
+            uses the same representation as Sudoku.update_grid:
+            bits of a non-negative cell mark the numbers that are NOT valid, and occupied cells are negative.
+            every change is recorded on an undo trail, so a search can roll back to a mark instead of copying the grid.
+            empty cells are also kept in buckets by the number of candidates they have lost,
+            each bucket being a bitmask of cell indices, so the most constrained cell is found without scanning the grid.
+
+        >>> from sudoku_api.core.geometry import get_geometry
+        >>> state = GridState(get_geometry(2), [0] * 16)
+        >>> mark = state.mark()
+        >>> state.place(0, 3)
+        >>> state.grid
+        [-3, 4, 4, 4, 4, 4, 0, 0, 4, 0, 0, 0, 4, 0, 0, 0]
+        >>> state.fewest_candidate_cell()
+        1
+        >>> state.undo(mark)
+        >>> state.grid
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+        >>> state.fewest_candidate_cell()
+        0
+        """
+        self.geometry = geometry
+        self.grid = list(grid)
+        self.trail: list[tuple[int, int, int, list[int]]] = []
+        self.propagations = 0
+        self.buckets = [0] * (geometry.max_num + 1)
+        for (idx, bit) in enumerate(self.grid):
+            if bit >= 0:
+                self.buckets[bit.bit_count()] |= 1 << idx
+
+    def mark(self) -> int:
+        """ return a position in the undo trail to roll back to later """
+        return len(self.trail)
+
+    def place(self, idx: int, number: int) -> None:
+        """ put a number into a cell and strike it out from the candidates of its peers """
+        grid = self.grid
+        buckets = self.buckets
+        number_bit = 1 << (number - 1)
+        changed = []
+        for cell in self.geometry.peers[idx]:
+            bit = grid[cell]
+            if bit >= 0 and not bit & number_bit:
+                grid[cell] = bit | number_bit
+                changed.append(cell)
+                count = bit.bit_count()
+                buckets[count] ^= 1 << cell
+                buckets[count + 1] ^= 1 << cell
+        bit = grid[idx]
+        buckets[bit.bit_count()] ^= 1 << idx
+        self.trail.append((idx, bit, number_bit, changed))
+        grid[idx] = -number
+
+    def undo(self, mark: int) -> None:
+        """ roll back every placement made after the given mark """
+        grid = self.grid
+        buckets = self.buckets
+        trail = self.trail
+        while len(trail) > mark:
+            (idx, bit, number_bit, changed) = trail.pop()
+            grid[idx] = bit
+            buckets[bit.bit_count()] ^= 1 << idx
+            for cell in changed:
+                bit = grid[cell]
+                grid[cell] = bit ^ number_bit
+                count = bit.bit_count()
+                buckets[count] ^= 1 << cell
+                buckets[count - 1] ^= 1 << cell
+
+    def fewest_candidate_cell(self) -> Optional[int]:
+        """ return the same cell as Sudoku.fewest_candidate_cell would for the current grid:
+            the first cell with at most one candidate if any, otherwise the first cell with fewest candidates.
+            return None if there are no empty cells.
+
+        >>> from sudoku_api.core.geometry import get_geometry
+        >>> state = GridState(get_geometry(2), [-1, 0, 3, 1, 15, -2, 7, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+        >>> state.fewest_candidate_cell()
+        4
+        >>> state = GridState(get_geometry(2), [-1, 0, 3, 1, 7, -2, 15, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+        >>> state.fewest_candidate_cell()
+        4
+        >>> state = GridState(get_geometry(2), [-1, 0, 3, 1, 5, -2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+        >>> state.fewest_candidate_cell()
+        2
+        >>> print(GridState(get_geometry(2), [-1] * 16).fewest_candidate_cell())
+        None
+        """
+        buckets = self.buckets
+        max_num = self.geometry.max_num
+        # a cell with one candidate or none ends the scan of Sudoku.fewest_candidate_cell, whichever comes first
+        cells = buckets[max_num] | buckets[max_num - 1]
+        count = max_num - 2
+        while not cells and count >= 0:
+            cells = buckets[count]
+            count -= 1
+        if not cells:
+            return None
+        return (cells & -cells).bit_length() - 1
+
+    def solution(self) -> str:
+        """ return the filled grid as a puzzle string """
+        return ''.join(str(-i) for i in self.grid)
+
+    def propagate(self) -> bool:
+        """ fill in naked singles and hidden singles repeatedly until nothing changes.
+            return False if a contradiction was found, i.e. an empty cell or a number in a row/column/square has nowhere to go.
+
+        >>> from sudoku_api.core.sudoku import Sudoku
+        >>> sudoku = Sudoku()
+        >>> puzzle = "600037500030200704070018000059100203040372050007800001000004006700620000260503907"
+        >>> state = GridState(sudoku.geometry, sudoku.map_puzzle_to_grid(puzzle))
+        >>> state.propagate()
+        True
+        >>> state.solution()
+        '612437598938265714475918632859146273146372859327859461583794126794621385261583947'
+
+        Return False for an unsolvable puzzle.
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> state = GridState(sudoku2x2.geometry, sudoku2x2.map_puzzle_to_grid("123443123.....2."))
+        >>> state.propagate()
+        False
+        """
+        grid = self.grid
+        buckets = self.buckets
+        geometry = self.geometry
+        full_mask = geometry.full_mask
+        max_num = geometry.max_num
+        changed = True
+        while changed:
+            changed = False
+
+            # naked singles: an empty cell with only one candidate left, read from the buckets
+            while cells := buckets[max_num] | buckets[max_num - 1]:
+                idx = (cells & -cells).bit_length() - 1
+                bit = grid[idx]
+                if bit == full_mask:
+                    return False
+                self.place(idx, (full_mask ^ bit).bit_length())
+                self.propagations += 1
+                changed = True
+
+            # hidden singles: a number with only one possible cell left in a row/column/square
+            for unit in geometry.units:
+                once = 0
+                twice = 0
+                placed = 0
+                for idx in unit:
+                    bit = grid[idx]
+                    if bit < 0:
+                        placed |= 1 << (-bit - 1)
+                    else:
+                        candidates = full_mask ^ bit
+                        twice |= once & candidates
+                        once |= candidates
+                if (once | placed) != full_mask:
+                    return False
+                singles = once & ~twice & ~placed
+                while singles:
+                    number_bit = singles & -singles
+                    singles ^= number_bit
+                    for idx in unit:
+                        bit = grid[idx]
+                        if bit >= 0 and not bit & number_bit:
+                            break
+                    else:
+                        # the only possible cell was taken by another single in this pass
+                        return False
+                    self.place(idx, number_bit.bit_length())
+                    self.propagations += 1
+                    changed = True
+        return True
+
+
+class DigitPositionState(GridState):
+    def __init__(self, geometry: Geometry, grid: list[int]):
+        """ a GridState which also keeps, for every number, a bitmask of the cells where it can still go.
+            masked with a row/column/square, it gives the possible positions of a number in that unit,
+            which is what the set-oriented freedom analysis (SOFA) looks for.
+
+        >>> from sudoku_api.core.geometry import get_geometry
+        >>> state = DigitPositionState(get_geometry(2), [0] * 16)
+        >>> mark = state.mark()
+        >>> state.place(0, 3)
+        >>> bin(state.positions[2])
+        '0b1110111011000000'
+        >>> state.undo(mark)
+        >>> bin(state.positions[2])
+        '0b1111111111111111'
+        """
+        super().__init__(geometry, grid)
+        self.positions = [0] * geometry.max_num
+        for (idx, bit) in enumerate(self.grid):
+            if bit >= 0:
+                for number in range(geometry.max_num):
+                    if not bit >> number & 1:
+                        self.positions[number] |= 1 << idx
+
+    def place(self, idx: int, number: int) -> None:
+        positions = self.positions
+        available = self.geometry.full_mask ^ self.grid[idx]
+        cell_bit = 1 << idx
+        while available:
+            number_bit = available & -available
+            available ^= number_bit
+            positions[number_bit.bit_length() - 1] &= ~cell_bit
+        super().place(idx, number)
+        number_positions = positions[number - 1]
+        for cell in self.trail[-1][3]:
+            number_positions &= ~(1 << cell)
+        positions[number - 1] = number_positions
+
+    def undo(self, mark: int) -> None:
+        positions = self.positions
+        full_mask = self.geometry.full_mask
+        for (idx, bit, number_bit, changed) in self.trail[mark:]:
+            available = full_mask ^ bit
+            cell_bit = 1 << idx
+            while available:
+                digit_bit = available & -available
+                available ^= digit_bit
+                positions[digit_bit.bit_length() - 1] |= cell_bit
+            number = number_bit.bit_length() - 1
+            for cell in changed:
+                positions[number] |= 1 << cell
+        super().undo(mark)
+
+    def fewest_candidate_sofa_set(self, upper_limit: int) -> Optional[Tuple[int, list[int]]]:
+        """ return the same result as Sudoku.fewest_candidate_sofa_set for the current grid:
+            the first number, by row/column/square and then by number, which has the fewest (but some) positions
+            in a unit, if that is fewer than upper_limit. the positions are listed as cell indices.
+
+        >>> from sudoku_api.core.sudoku import Sudoku
+        >>> sudoku = Sudoku()
+        >>> sofa_puzzle = "534008010000002090000007604000500100100000003009001000305400000080200000060700382"
+        >>> state = DigitPositionState(sudoku.geometry, sudoku.map_puzzle_to_grid(sofa_puzzle))
+        >>> state.fewest_candidate_sofa_set(3)
+        (2, [6])
+        >>> print(state.fewest_candidate_sofa_set(1))
+        None
+        """
+        positions = self.positions
+        best = None
+        for unit_mask in self.geometry.unit_masks:
+            for (number, number_positions) in enumerate(positions):
+                cells = number_positions & unit_mask
+                if cells:
+                    count = cells.bit_count()
+                    if count < upper_limit:
+                        best = (number + 1, cells)
+                        if count == 1:
+                            break
+                        upper_limit = count
+            else:
+                continue
+            break
+        if best is None:
+            return None
+        (number, cells) = best
+        possible_positions = []
+        while cells:
+            cell_bit = cells & -cells
+            cells ^= cell_bit
+            possible_positions.append(cell_bit.bit_length() - 1)
+        return (number, possible_positions)
@@ -1,11 +1,23 @@
 import itertools
 import random
-from typing import Iterable, Optional, Tuple
-from sudoku_api.core.utils import conv_bit_to_num_list, count_bit, all_unique, replace_string, sofa_find_candidate
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Tuple
+from sudoku_api.core.utils import all_unique, replace_string, sofa_find_candidate
+from sudoku_api.core.bit_tables import get_bit_tables
 from sudoku_api.core.display import display_grid
+from sudoku_api.core.geometry import get_geometry
+from sudoku_api.core.grid_state import GridState, DigitPositionState
+from sudoku_api.core.dlx import ExactCover
+from sudoku_api.core.budget import SearchBudget, SearchAborted
+from sudoku_api.core.stats import SearchStats
 from result import Ok, Err, Result
 
 
+SOLVER_METHODS = ('trail', 'naive', 'dlx')
+SEARCH_LIMIT_EXCEEDED = 'search limit exceeded'
+
+
 class Sudoku():
     def __init__(self, width: int = 3, height: int = None):
         """ return a new sudoku instance.
@@ -26,6 +38,15 @@ class Sudoku():
         self.height = height or self.width
         self.max_num = width ** 2
         self.number_of_cells = width ** 4
+        self.geometry = get_geometry(self.width, self.height)
+        self.bits = get_bit_tables(self.max_num)
+        # the number of each char allowed in a puzzle string, with 0 for empty cells
+        self.char_numbers = {str(i): i for i in range(min(self.max_num, 9) + 1)}
+        self.char_numbers['.'] = 0
+        self.budget = SearchBudget()
+        self.stats = SearchStats()
+        # every instance draws from its own generator, so that generating on one instance is not affected by others
+        self.random = random.Random()
 
     def validate_puzzle_string(self, puzzle: str) -> Result[bool, str]:
         """ Validate a string as a representation of Sudoku puzzle
@@ -64,14 +85,79 @@ class Sudoku():
         # >>> sudoku2x2.validate_puzzle_string('1234341223414A..')
         # False
         """
+        match self.parse_puzzle(puzzle):
+            case Err(err_msg):
+                return Err(err_msg)
+            case _:
+                return Ok()
+
+    def parse_puzzle(self, puzzle: str, stats: Optional[SearchStats] = None) -> Result[list[int], str]:
+        """
+        validate a puzzle string and map it to a grid of candidates in one pass,
+        with the same errors as validate_puzzle_string and the same grid as map_puzzle_to_grid.
+        if stats are given, the time to check the chars is recorded in validate_time,
+        and the time to build the grid, which also finds duplicated numbers, in map_time.
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> sudoku2x2.parse_puzzle('..3..4.22.4..1.3')
+        Ok([14, 13, -3, 6, 10, -4, 14, -2, -2, 11, -4, 14, 7, -1, 13, -3])
+        >>> sudoku2x2.parse_puzzle('..3..4.22.4..1.')
+        Err('The length of puzzle is not correct. Should have exactly 16 chars.')
+
+        An invalid char is reported before a duplicated number.
+        >>> sudoku2x2.parse_puzzle('113..4.22.4..1.A')
+        Err('Invalid char in puzzle. Can only contain 0, . or number 1-4')
+        >>> sudoku2x2.parse_puzzle('113..4.22.4..1.3')
+        Err('Duplicated number found in row/column/square.')
+        >>> sudoku2x2.parse_puzzle('..3..4.22.4..1.5')
+        Err('Invalid char in puzzle. Can only contain 0, . or number 1-4')
+        """
+        start = time.perf_counter()
+        error = None
         if len(puzzle) != self.number_of_cells:
-            return Err(f'The length of puzzle is not correct. Should have exactly {self.number_of_cells} chars.')
-        elif not all(char == '.' or (char.isnumeric() and int(char) <= self.max_num) for char in puzzle):
-            return Err(f'Invalid char in puzzle. Can only contain 0, . or number 1-{self.max_num}')
-        elif not self.numbers_are_unique(puzzle):
-            return Err('Duplicated number found in row/column/square.')
+            error = f'The length of puzzle is not correct. Should have exactly {self.number_of_cells} chars.'
         else:
-            return Ok()
+            char_numbers = self.char_numbers
+            numbers = [char_numbers.get(char) for char in puzzle]
+            if None in numbers:
+                error = f'Invalid char in puzzle. Can only contain 0, . or number 1-{self.max_num}'
+        validated = time.perf_counter()
+        if stats is not None:
+            stats.validate_time = validated - start
+        if error:
+            return Err(error)
+        (grid, duplicated) = self.build_grid(numbers)
+        if stats is not None:
+            stats.map_time = time.perf_counter() - validated
+        if duplicated:
+            return Err('Duplicated number found in row/column/square.')
+        return Ok(grid)
+
+    def build_grid(self, numbers: list[int]) -> Tuple[list[int], bool]:
+        """
+        map the numbers of a puzzle (0 for empty cells) to a grid of candidates,
+        by collecting the numbers taken in each row/column/square once.
+        also return whether any number is duplicated in a row/column/square.
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> sudoku2x2.build_grid([1, 0, 0, 0] + [0] * 12)
+        ([-1, 1, 1, 1, 1, 1, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0], False)
+        >>> sudoku2x2.build_grid([1, 1, 0, 0] + [0] * 12)[1]
+        True
+        """
+        cell_units = self.geometry.cell_units
+        taken = [0] * len(self.geometry.units)
+        duplicated = False
+        for (idx, number) in enumerate(numbers):
+            if number:
+                number_bit = 1 << (number - 1)
+                (row, column, square) = cell_units[idx]
+                if (taken[row] | taken[column] | taken[square]) & number_bit:
+                    duplicated = True
+                taken[row] |= number_bit
+                taken[column] |= number_bit
+                taken[square] |= number_bit
+        grid = [-number if number else taken[row] | taken[column] | taken[square]
+                for (number, (row, column, square)) in zip(numbers, cell_units)]
+        return (grid, duplicated)
 
     def numbers_are_unique(self, puzzle: str) -> bool:
         """
@@ -143,7 +229,7 @@ class Sudoku():
         >>> list(sudoku2x2.row(1))
         [0, 1, 2, 3]
         """
-        return range((n - 1) * self.max_num, n * self.max_num)
+        return self.geometry.rows[n - 1]
 
     def square(self, n: int) -> Iterable[int]:
         """ return an iterable with indice of cells that belongs to square n
@@ -165,10 +251,7 @@ class Sudoku():
         >>> list(sudoku2x2.square(4))
         [10, 11, 14, 15]
         """
-        row_offset = ((n - 1) // self.width) * self.width ** 3
-        column_offset = ((n - 1) % self.width) * self.width
-        start = row_offset + column_offset
-        return itertools.chain.from_iterable(range(start + i * self.max_num, start + i * self.max_num + self.width) for i in range(self.width))
+        return self.geometry.squares[n - 1]
 
     def column(self, n: int) -> Iterable[int]:
         """ return an iterable with indice of cells that belongs to column n
@@ -188,7 +271,7 @@ class Sudoku():
         >>> list(sudoku2x2.column(4))
         [3, 7, 11, 15]
         """
-        return range((n-1), self.width ** 4, self.width ** 2)
+        return self.geometry.columns[n - 1]
 
     def all_rows_columns_squares(self) -> Iterable[Iterable[int]]:
         """
@@ -196,7 +279,7 @@ class Sudoku():
         >>> sudoku2x2 = Sudoku(width=2)
         >>> [list(iter) for iter in sudoku2x2.all_rows_columns_squares()]
         [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11], [12, 13, 14, 15], [0, 4, 8, 12], [1, 5, 9, 13], [2, 6, 10, 14], [3, 7, 11, 15], [0, 1, 4, 5], [2, 3, 6, 7], [8, 9, 12, 13], [10, 11, 14, 15]] """
-        return itertools.chain((self.row(i) for i in range(1, self.max_num + 1)), (self.column(i) for i in range(1, self.max_num + 1)), (self.square(i) for i in range(1, self.max_num + 1)))
+        return self.geometry.units
 
     def cell_to_row(self, idx: int) -> int:
         """ return the row number of a cell
@@ -276,10 +359,7 @@ class Sudoku():
         >>> set(sudoku2x2.same_row_column_square(9))
         {1, 5, 8, 9, 10, 11, 12, 13}
         """
-        r = self.cell_to_row(idx)
-        c = self.cell_to_column(idx)
-        s = self.cell_to_square(idx)
-        return itertools.chain(self.row(r), self.column(c), self.square(s))
+        return itertools.chain((idx,), self.geometry.peers[idx])
 
     def update_grid(self, grid: list[int], idx: int, number: int) -> list[int]:
         """
@@ -300,9 +380,10 @@ class Sudoku():
         4, 0, 0, ... 0]
         """
         new_grid = grid.copy()
-        for cell in self.same_row_column_square(idx):
+        number_bit = 1 << (number - 1)
+        for cell in self.geometry.peers[idx]:
             if (new_grid[cell] >= 0):
-                new_grid[cell] |= (1 << (number - 1))
+                new_grid[cell] |= number_bit
         new_grid[idx] = -number
         return new_grid
 
@@ -319,13 +400,7 @@ class Sudoku():
         >>> sudoku2x2.map_puzzle_to_grid(puzzle)
         [14, 13, -3, 6, 10, -4, 14, -2, -2, 11, -4, 14, 7, -1, 13, -3]
         """
-        grid = [0 for _ in range(self.max_num ** 2)]
-        puzzle = puzzle.replace('.', '0')
-        for idx in range(len(puzzle)):
-            if puzzle[idx] != '0':
-                grid = self.update_grid(
-                    grid, idx, int(puzzle[idx]))
-        return grid
+        return self.build_grid([0 if char == '.' else int(char) for char in puzzle])[0]
 
     def fewest_candidate_cell(self, grid: list[int]) -> Optional[int]:
         """
@@ -350,20 +425,27 @@ class Sudoku():
         >>> print(sudoku.fewest_candidate_cell(grid4))
         None
         """
+        popcount = self.bits.popcount
         fewest = None
         highest_bits = -1
-        for cell in range(0, len(grid)):
-            if grid[cell] >= 0 and count_bit(grid[cell]) > highest_bits:
+        for (cell, bit) in enumerate(grid):
+            if bit >= 0 and popcount[bit] > highest_bits:
                 fewest = cell
-                highest_bits = count_bit(grid[cell])
+                highest_bits = popcount[bit]
                 if highest_bits == self.max_num - 1:
                     # return early if found a cell with only have 1 possible choice of number
                     return fewest
         return fewest
 
-    def solve_puzzle(self, puzzle: str) -> Result[list[str], 'str']:
+    def solve_puzzle(self, puzzle: str, method: str = 'trail', max_solutions: int = 2,
+                     time_limit: Optional[float] = None, node_limit: Optional[int] = None) -> Result[list[str], 'str']:
         """
-        solve a sudoku puzzle by backtracking.
+        solve a sudoku puzzle by backtracking, stopping after max_solutions solutions are found.
+        method chooses the search backend:
+        'trail' backtracks on a single grid updated in place, 'naive' copies the grid at every node,
+        'dlx' solves the puzzle as an exact cover problem with dancing links.
+        the search is aborted if it takes longer than time_limit seconds, or visits more than node_limit nodes.
+        the work done is recorded in self.stats.
         >>> puzzle1 = "123434122341412."
         >>> sudoku2x2 = Sudoku(width=2)
         >>> sudoku2x2.solve_puzzle(puzzle1)
@@ -393,23 +475,152 @@ class Sudoku():
         >>> puzzle5 = "1234567894567891237801234562316740958759123646905382073172659485428976319683415A2"
         >>> sudoku.solve_puzzle(puzzle5)
         Err('Invalid char in puzzle. Can only contain 0, . or number 1-9')
+
+        The backends find the same set of solutions, but not in the same order.
+        >>> sorted(sudoku2x2.solve_puzzle(puzzle2, method='naive').ok())
+        ['1234341221434321', '1234341223414123']
+        >>> sorted(sudoku2x2.solve_puzzle(puzzle2, method='dlx').ok())
+        ['1234341221434321', '1234341223414123']
+        >>> sudoku.solve_puzzle(puzzle3, method='dlx')
+        Ok(['76923541885...81625'])
+        >>> sudoku2x2.solve_puzzle(puzzle4, method='dlx')
+        Err('puzzle is unsolvable')
+        >>> puzzle6 = "300178000000095000001000903180000400940000072007000065604000300000580000000000000"
+        >>> every = [sorted(sudoku.solve_puzzle(puzzle6, method=method, max_solutions=1000).ok()) for method in SOLVER_METHODS]
+        >>> len(every[0]), every[0] == every[1] == every[2]
+        (425, True)
+
+        'trail' fills in singles before branching, so it branches on other cells than 'naive'.
+        when a puzzle has more solutions than max_solutions, the two may return different ones.
+        >>> puzzle7 = "000000270008270045040000008000567010005009007000040000200000401900010000000000000"
+        >>> sudoku.solve_puzzle(puzzle7).ok()[0]
+        '563184279198273645742695138329567814415829367876341952257936481934718526681452793'
+        >>> sudoku.solve_puzzle(puzzle7, method='naive').ok()[0]
+        '561984273398276145742135968829567314415329687637841529273658491954712836186493752'
+
+        Ask for more solutions with max_solutions.
+        >>> len(sudoku2x2.solve_puzzle(puzzle2, max_solutions=5).ok())
+        4
+        >>> len(sudoku.solve_puzzle("123456789" + "." * 72, method='naive', max_solutions=5).ok())
+        5
+        >>> sudoku2x2.solve_puzzle(puzzle2, max_solutions=1)
+        Ok(['1234341221434321'])
+
+        >>> sudoku2x2.solve_puzzle(puzzle2, method='foo')
+        Err('Unknown solver method. Should be one of: trail, naive, dlx')
+
+        Give up on a search which is too long.
+        >>> sudoku.solve_puzzle(puzzle3, method='naive', node_limit=5)
+        Err('search limit exceeded')
+        >>> sudoku.solve_puzzle("." * 81, max_solutions=100, node_limit=50)
+        Err('search limit exceeded')
+        >>> sudoku.solve_puzzle(puzzle3, method='dlx', time_limit=5, node_limit=1000)
+        Ok(['76923541885...81625'])
+
+        >>> sudoku2x2.solve_puzzle(puzzle2, method='naive')
+        Ok(['1234341221434321', '1234341223414123'])
+        >>> (sudoku2x2.stats.nodes, sudoku2x2.stats.backtracks, sudoku2x2.stats.max_depth)
+        (13, 0, 8)
         """
+        if method not in SOLVER_METHODS:
+            return Err(f'Unknown solver method. Should be one of: {", ".join(SOLVER_METHODS)}')
 
-        validation_result = self.validate_puzzle_string(puzzle)
-        if err_msg := validation_result.err():
+        self.stats = SearchStats()
+        parse_result = self.parse_puzzle(puzzle, self.stats)
+        if err_msg := parse_result.err():
             return Err(err_msg)
 
-        grid = self.map_puzzle_to_grid(puzzle)
-        if any(candidate == 2 ** self.max_num - 1 for candidate in grid):
+        grid = parse_result.unwrap()
+        if any(candidate == self.geometry.full_mask for candidate in grid):
             return Err('puzzle is unsolvable')
 
-        solutions = self.naive_solve(grid)
+        try:
+            with self.searching(time_limit, node_limit):
+                if method == 'naive':
+                    solutions = self.naive_solve(grid, max_solutions)
+                elif method == 'dlx':
+                    solutions = self.dlx_solve(grid, max_solutions)
+                else:
+                    solutions = self.trail_solve(grid, max_solutions)
+        except SearchAborted:
+            return Err(SEARCH_LIMIT_EXCEEDED)
         if solutions:
             return Ok(solutions)
         else:
             return Err('no solution was found.')
 
-    def naive_solve(self, grid: list[int]) -> list[str]:
+    @contextmanager
+    def searching(self, time_limit: Optional[float] = None, node_limit: Optional[int] = None) -> Iterator[None]:
+        """
+        run a search with a fresh SearchBudget, recording its time and nodes in self.stats.
+        """
+        (previous_budget, self.budget) = (
+            self.budget, SearchBudget(time_limit, node_limit))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats.search_time = time.perf_counter() - start
+            self.stats.nodes = self.budget.nodes
+            self.budget = previous_budget
+
+    def analyse_puzzle(self, puzzle: str, max_solutions: int = 2,
+                       time_limit: Optional[float] = None, node_limit: Optional[int] = None) -> Result[Tuple[list[str], Optional[int]], str]:
+        """
+        solve a puzzle and score its difficulty in one SOFA search, as sofa_evaluate_difficulty does.
+        return up to max_solutions solutions (at least two are looked for, to tell whether the solution is unique),
+        and the difficulty score, which is None unless the solution is unique.
+        errors are the same as solve_puzzle.
+        >>> sudoku = Sudoku()
+        >>> sofa_puzzle = "534008010000002090000007604000500100100000003009001000305400000080200000060700382"
+        >>> sudoku.analyse_puzzle(sofa_puzzle)
+        Ok((['534968217716342598298157634873524169152679843649831725325486971987213456461795382'], 55))
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> sudoku2x2.analyse_puzzle("12343412........", max_solutions=5)
+        Ok((['1234341221434321', '1234341223414123', '1234341241232341', '1234341243212143'], None))
+        >>> sudoku2x2.analyse_puzzle("12343412........", max_solutions=1)
+        Ok((['1234341221434321'], None))
+        >>> sudoku2x2.analyse_puzzle("123443123.....2.")
+        Err('puzzle is unsolvable')
+        >>> sudoku.analyse_puzzle("." * 81, node_limit=10)
+        Err('search limit exceeded')
+        """
+        self.stats = SearchStats()
+        parse_result = self.parse_puzzle(puzzle, self.stats)
+        if err_msg := parse_result.err():
+            return Err(err_msg)
+
+        grid = parse_result.unwrap()
+        if any(candidate == self.geometry.full_mask for candidate in grid):
+            return Err('puzzle is unsolvable')
+
+        solutions: list[str] = []
+        try:
+            with self.searching(time_limit, node_limit):
+                branching_factors = self.sofa_search(
+                    DigitPositionState(self.geometry, grid), solutions, max(max_solutions, 2))
+        except SearchAborted:
+            return Err(SEARCH_LIMIT_EXCEEDED)
+        if not solutions:
+            return Err('no solution was found.')
+        score = None
+        if len(solutions) == 1:
+            score = self.difficulty_score(grid, branching_factors)
+        return Ok((solutions[:max_solutions], score))
+
+    def difficulty_score(self, grid: list[int], branching_factors: list[int]) -> int:
+        """
+        the difficulty score of a puzzle: 100 * sum of (Bi - 1)^2 for the branching factor Bi of each node
+        on the way to its solution, plus the number of empty cells.
+        """
+        empty_cells_score = sum(1 for cell in grid if cell >= 0)
+        branching_factors_score = sum(
+            (b - 1) ** 2 for b in branching_factors) * 100
+        return empty_cells_score + branching_factors_score
+
+    def naive_solve(self, grid: list[int], max_solutions: int = 2, depth: int = 0) -> list[str]:
+        self.budget.tick()
+        self.stats.reach(depth)
         cell_to_try = self.fewest_candidate_cell(grid)
         if cell_to_try == None:
             # no empty cells.
@@ -418,10 +629,11 @@ class Sudoku():
             return [solution]
 
         bit = grid[cell_to_try]
-        if bit == 2 ** self.max_num - 1:
+        if bit == self.geometry.full_mask:
             # found an empty cell which cannot fit any number.
             # i.e. puzzle is unsolvable at this point
             # do a backtrack at such situation
+            self.stats.backtracks += 1
             return []
 
         solutions = []
@@ -434,16 +646,175 @@ class Sudoku():
                 # last bit = 0. try to put this number into the cell.
                 new_grid = self.update_grid(
                     grid, cell_to_try, number_to_try)
-                solution_found = self.naive_solve(new_grid)
+                solution_found = self.naive_solve(
+                    new_grid, max_solutions - len(solutions), depth + 1)
                 if solution_found:
                     solutions += solution_found
-                if len(solutions) > 1:
-                    # more than one solution found
+                if len(solutions) >= max_solutions:
+                    # enough solutions found
                     return solutions
             number_to_try += 1
             bit >>= 1
         return solutions
 
+    def trail_solve(self, grid: list[int], max_solutions: int = 2, propagate: bool = True) -> list[str]:
+        """
+        solve a grid by backtracking on one GridState, undoing placements from its trail instead of copying the grid.
+        if propagate is True, naked and hidden singles are filled in before branching at every node,
+        otherwise it visits cells and numbers in the same order as naive_solve.
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> sudoku2x2.trail_solve(sudoku2x2.map_puzzle_to_grid("12343412........"), propagate=False)
+        ['1234341221434321', '1234341223414123']
+        >>> sudoku2x2.trail_solve(sudoku2x2.map_puzzle_to_grid("12343412........"))
+        ['1234341221434321', '1234341223414123']
+        """
+        state = GridState(self.geometry, grid)
+        solutions: list[str] = []
+        try:
+            self.trail_search(state, solutions, max_solutions, propagate)
+        finally:
+            self.stats.propagations += state.propagations
+        return solutions
+
+    def trail_search(self, state: GridState, solutions: list[str], max_solutions: int, propagate: bool = True, depth: int = 0) -> None:
+        self.budget.tick()
+        self.stats.reach(depth)
+        if propagate and not state.propagate():
+            # a contradiction was found. backtrack.
+            self.stats.backtracks += 1
+            return
+
+        grid = state.grid
+        cell_to_try = state.fewest_candidate_cell()
+        if cell_to_try == None:
+            # no empty cells. i.e. a solution is found.
+            solutions.append(state.solution())
+            return
+
+        bit = grid[cell_to_try]
+        if bit == self.geometry.full_mask:
+            # found an empty cell which cannot fit any number. backtrack.
+            self.stats.backtracks += 1
+            return
+
+        mark = state.mark()
+        for number_to_try in range(1, self.max_num + 1):
+            if bit & 1 == 0:
+                state.place(cell_to_try, number_to_try)
+                self.trail_search(state, solutions, max_solutions, propagate, depth + 1)
+                state.undo(mark)
+                if len(solutions) >= max_solutions:
+                    return
+            bit >>= 1
+
+    def trail_count(self, state: GridState, limit: int) -> int:
+        """
+        count the solutions below the current state of a trail search, up to limit.
+        """
+        self.budget.tick()
+        if not state.propagate():
+            return 0
+
+        grid = state.grid
+        cell_to_try = state.fewest_candidate_cell()
+        if cell_to_try == None:
+            return 1
+
+        bit = grid[cell_to_try]
+        if bit == self.geometry.full_mask:
+            return 0
+
+        count = 0
+        mark = state.mark()
+        for number_to_try in range(1, self.max_num + 1):
+            if bit & 1 == 0:
+                state.place(cell_to_try, number_to_try)
+                count += self.trail_count(state, limit - count)
+                state.undo(mark)
+                if count >= limit:
+                    return count
+            bit >>= 1
+        return count
+
+    def count_solutions(self, puzzle: str, limit: int = 2) -> Result[int, str]:
+        """
+        count the solutions of a puzzle without building solution strings, stopping once limit is reached.
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> sudoku2x2.count_solutions("123434122341412.")
+        Ok(1)
+        >>> sudoku2x2.count_solutions("12343412........", limit=10)
+        Ok(4)
+        >>> sudoku2x2.count_solutions("." * 16, limit=1000)
+        Ok(288)
+        >>> sudoku2x2.count_solutions("." * 16, limit=10)
+        Ok(10)
+        >>> sudoku2x2.count_solutions("123443123.....2.")
+        Ok(0)
+        >>> sudoku2x2.count_solutions("12345")
+        Err('The length of puzzle is not correct. Should have exactly 16 chars.')
+        """
+        parse_result = self.parse_puzzle(puzzle)
+        if err_msg := parse_result.err():
+            return Err(err_msg)
+
+        state = GridState(self.geometry, parse_result.unwrap())
+        return Ok(self.trail_count(state, limit))
+
+    def solve_by_logic(self, puzzle: str) -> Result[Tuple[str, bool], str]:
+        """
+        fill in a puzzle with naked singles and hidden singles only, without any guessing.
+        return the resulting puzzle string, and whether it was solved by logic alone.
+        >>> sudoku = Sudoku()
+        >>> sudoku.solve_by_logic("600037500030200704070018000059100203040372050007800001000004006700620000260503907")
+        Ok(('612437598938265714475918632859146273146372859327859461583794126794621385261583947', True))
+        >>> sudoku.solve_by_logic("800000000003600000070090200050007000000045700000100030001000068008500010090000400")
+        Ok(('800000000003600000070090200050007000000045700000100030001000068008500010090000400', False))
+
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> sudoku2x2.solve_by_logic("123443123.....2.")
+        Err('puzzle is unsolvable')
+        """
+        parse_result = self.parse_puzzle(puzzle)
+        if err_msg := parse_result.err():
+            return Err(err_msg)
+
+        state = GridState(self.geometry, parse_result.unwrap())
+        if not state.propagate():
+            return Err('puzzle is unsolvable')
+        filled = ''.join('0' if i >= 0 else str(-i) for i in state.grid)
+        return Ok((filled, all(i < 0 for i in state.grid)))
+
+    def dlx_solve(self, grid: list[int], max_solutions: int = 2) -> list[str]:
+        """
+        solve a grid as an exact cover problem by Algorithm X with dancing links.
+        every (cell, number) candidate is a row covering four columns: the cell itself, and the number in its row/column/square.
+        occupied cells only get the row of their own number.
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> sudoku2x2.dlx_solve(sudoku2x2.map_puzzle_to_grid("123434122341412."))
+        ['1234341223414123']
+        >>> len(sudoku2x2.dlx_solve([0] * 16, max_solutions=300))
+        288
+        """
+        max_num = self.max_num
+        number_of_cells = self.number_of_cells
+        matrix = ExactCover(number_of_cells * 4)
+        candidates = []
+        for (idx, bit) in enumerate(grid):
+            units = self.geometry.cell_units[idx]
+            numbers = [-bit] if bit < 0 else self.bits.available[bit]
+            for number in numbers:
+                matrix.add_row([idx] + [number_of_cells + unit * max_num + number - 1 for unit in units])
+                candidates.append((idx, number))
+
+        solutions = []
+        for rows in matrix.solve(max_solutions, self.budget, self.stats):
+            solution = [0 for _ in range(number_of_cells)]
+            for row in rows:
+                (idx, number) = candidates[row]
+                solution[idx] = number
+            solutions.append(''.join(str(i) for i in solution))
+        return solutions
+
     def evaluate_difficulty(self, puzzle: str, solution: str | None = None) -> Result[int, str]:
         """
         Calculate a difficulty score of a puzzle using an algorithm in this article https://dlbeer.co.nz/articles/sudoku.html
@@ -490,15 +861,16 @@ class Sudoku():
         empty_cells_score = sum(1 for cell in grid if cell >= 0)
         branching_factors_score = 0
 
-        next_cell = self.fewest_candidate_cell(grid)
+        state = GridState(self.geometry, grid)
+        next_cell = state.fewest_candidate_cell()
         while next_cell != None:
-            bit = grid[next_cell]
-            branching_factor = self.max_num - count_bit(bit)
+            bit = state.grid[next_cell]
+            branching_factor = self.max_num - self.bits.popcount[bit]
             branching_factors_score += ((branching_factor - 1) ** 2) * 100
-            grid = self.update_grid(grid, next_cell, int(solution[next_cell]))
-            next_cell = self.fewest_candidate_cell(grid)
+            state.place(next_cell, int(solution[next_cell]))
+            next_cell = state.fewest_candidate_cell()
 
-        solution_2 = ''.join(str(-i) for i in grid)
+        solution_2 = state.solution()
         if solution != solution_2:
             raise RuntimeError("unknown error in calculating difficulty")
 
@@ -509,9 +881,7 @@ class Sudoku():
         """
         check whether a puzzle has an unique solution.
         """
-        try_solve = self.solve_puzzle(puzzle)
-        count_solutions = len(try_solve.unwrap_or([]))
-        return count_solutions == 1
+        return self.count_solutions(puzzle, limit=2).unwrap_or(0) == 1
 
     def random_digit_list(self) -> list[int]:
         """
@@ -522,15 +892,15 @@ class Sudoku():
         9
         >>> all((i in list1)for i in range(1, 9))
         True
-        >>> random.seed('test')
+        >>> sudoku.random.seed('test')
         >>> sudoku.random_digit_list()
         [7, 3, 6, 8, 9, 1, 2, 4, 5]
-        >>> random.seed('test2')
+        >>> sudoku.random.seed('test2')
         >>> sudoku.random_digit_list()
         [5, 9, 4, 2, 8, 3, 1, 6, 7]
         """
         num_list = [i for i in range(1, self.max_num + 1)]
-        random.shuffle(num_list)
+        self.random.shuffle(num_list)
         return num_list
 
     def available_numbers(self, bit: int) -> list[int]:
@@ -546,33 +916,36 @@ class Sudoku():
         """
         if bit < 0:
             return []
-        elif bit == 0:
-            return [i for i in range(1, self.max_num + 1)]
-        else:
-            numbers_taken = conv_bit_to_num_list(bit)
-            return [i for i in range(1, self.max_num + 1) if not i in numbers_taken]
+        return list(self.bits.available[bit])
 
     def random_solver(self, grid: list[int]) -> list[int]:
         """
         randomly generate a complete sudoku grid from a partially filled grid
         """
-        next_cell = self.fewest_candidate_cell(grid)
+        state = GridState(self.geometry, grid)
+        if self.random_search(state):
+            return state.grid
+        return []
+
+    def random_search(self, state: GridState) -> bool:
+        next_cell = state.fewest_candidate_cell()
         if next_cell == None:
-            return grid
+            return True
 
-        bit = grid[next_cell]
-        if bit == 2 ** self.max_num - 1:
-            return []
+        bit = state.grid[next_cell]
+        if bit == self.geometry.full_mask:
+            return False
 
         number_choices = self.available_numbers(bit)
-        random.shuffle(number_choices)
+        self.random.shuffle(number_choices)
+        mark = state.mark()
         while number_choices:
             number_to_try = number_choices.pop()
-            new_grid = self.update_grid(grid, next_cell, number_to_try)
-            solution_found = self.random_solver(new_grid)
-            if solution_found:
-                return solution_found
-        return []
+            state.place(next_cell, number_to_try)
+            if self.random_search(state):
+                return True
+            state.undo(mark)
+        return False
 
     def sofa_evaluate_difficulty(self, puzzle: str) -> Result[int, str]:
         """
@@ -585,17 +958,17 @@ class Sudoku():
         >>> sudoku.sofa_evaluate_difficulty(sofa_puzzle)
         Ok(55)
         """
+        self.stats = SearchStats()
         grid = self.map_puzzle_to_grid(puzzle)
-        empty_cells_score = sum(1 for cell in grid if cell >= 0)
-        solver_result = self.sofa_solver_recur(grid)
-        if solver_result.is_ok():
-            branching_factors = solver_result.unwrap()
-            branching_factors_score = sum(
-                (b - 1) ** 2 for b in branching_factors) * 100
-            total_score = empty_cells_score + branching_factors_score
-            return Ok(total_score)
-        else:
-            return Err(solver_result.unwrap_err())
+        solutions: list[str] = []
+        with self.searching():
+            branching_factors = self.sofa_search(
+                DigitPositionState(self.geometry, grid), solutions, 2)
+        if len(solutions) > 1:
+            return Err("solution to this puzzle is not unique")
+        elif not solutions:
+            return Err("solution not found at this route")
+        return Ok(self.difficulty_score(grid, branching_factors))
 
     def fewest_candidate_sofa_set(self, grid: list[int], upper_limit: int) -> Optional[Tuple[int, list[int]]]:
         """
@@ -611,8 +984,7 @@ class Sudoku():
         number = None
         possible_pos_in_grid = None
 
-        for cells_iter in self.all_rows_columns_squares():
-            cell_idxs_in_set = list(cells_iter)
+        for cell_idxs_in_set in self.geometry.units:
             bits = [grid[idx] for idx in cell_idxs_in_set]
             candidate = sofa_find_candidate(bits, upper_limit, self.max_num)
             if candidate:
@@ -628,94 +1000,114 @@ class Sudoku():
         else:
             return None
 
-    def sofa_solver_recur(self, grid: list[int], ensure_unique_solution=True) -> Result[list[int], str]:
-        next_cell = self.fewest_candidate_cell(grid)
+    def sofa_search(self, state: DigitPositionState, solutions: list[str], max_solutions: int, depth: int = 0) -> Optional[list[int]]:
+        """
+        search below the current state, branching on the fewest candidate cell, or on the cells a number can take in a
+        row/column/square if that is fewer (SOFA). solutions found are appended until there are max_solutions.
+        return the branching factors of the nodes on the way to the first solution found, or None if there is none.
+        """
+        self.budget.tick()
+        self.stats.reach(depth)
+        next_cell = state.fewest_candidate_cell()
 
         if next_cell == None:
             # no empty cells. i.e. a solution is found.
-            return Ok([])
+            solutions.append(state.solution())
+            return []
 
-        bit = grid[next_cell]
-        if bit == 2 ** self.max_num - 1:
+        bit = state.grid[next_cell]
+        if bit == self.geometry.full_mask:
             # found an empty cell which cannot fit any number.
             # i.e. puzzle is unsolvable at this point
             # do a backtrack at such situation
-            return Err('solution not found at this route')
+            self.stats.backtracks += 1
+            return None
 
-        branching_factor = self.max_num - count_bit(bit)
+        moves = self.sofa_moves(state, next_cell)
+        branching_factors = None
+        mark = state.mark()
+        for (idx, number) in moves:
+            state.place(idx, number)
+            found = self.sofa_search(
+                state, solutions, max_solutions, depth + 1)
+            state.undo(mark)
+            if found is not None and branching_factors is None:
+                branching_factors = [len(moves)] + found
+            if len(solutions) >= max_solutions:
+                break
+        return branching_factors
+
+    def sofa_moves(self, state: DigitPositionState, next_cell: int) -> list[Tuple[int, int]]:
+        """
+        return the (cell, number) placements to branch on at a node of the SOFA search, whose fewest candidate cell is next_cell.
+        """
+        bit = state.grid[next_cell]
+        branching_factor = self.max_num - self.bits.popcount[bit]
         sofa_search_result = None
         if branching_factor > 1:  # skip sofa search if bf is only 1.
-            sofa_search_result = self.fewest_candidate_sofa_set(
-                grid, branching_factor)
+            sofa_search_result = state.fewest_candidate_sofa_set(
+                branching_factor)
         if sofa_search_result:
-            return self.solver_sofa_route(grid, sofa_search_result, ensure_unique_solution)
-        else:
-            return self.solver_non_sofa_route(grid, next_cell, ensure_unique_solution)
-
-    def solver_sofa_route(self, grid: list[int], sofa_search_result, ensure_unique_solution=True) -> Result[list[int], str]:
-        # sofa route
-        solution_already_found = False
-        (number, possible_pos_in_grid) = sofa_search_result
-        branching_factors = [len(possible_pos_in_grid)]
-        for idx in possible_pos_in_grid:
-            new_grid = self.update_grid(grid, idx, number)
-            solver_result = self.sofa_solver_recur(
-                new_grid, ensure_unique_solution)
-
-            match solver_result:
-                case Err("solution to this puzzle is not unique"):
-                    return solver_result
-                case Err(_):
-                    continue
-                case Ok(branching_factors_from_recur):
-                    # a solution was found.
-                    if ensure_unique_solution:
-                        if solution_already_found:
-                            return Err("solution to this puzzle is not unique")
-                        else:
-                            branching_factors += branching_factors_from_recur
-                            solution_already_found = True
-                    else:
-                        return Ok([branching_factors] + branching_factors_from_recur)
-        if solution_already_found:
-            return Ok(branching_factors)
-        else:
-            return Err("solution not found at this route")
+            # sofa route: try every cell a number can take in a row/column/square
+            (number, possible_pos_in_grid) = sofa_search_result
+            return [(idx, number) for idx in possible_pos_in_grid]
+        # non-sofa route: try every number the cell can take
+        return [(next_cell, number) for number in self.bits.available[bit]]
 
-    def solver_non_sofa_route(self, grid: list[int], next_cell: int, ensure_unique_solution: bool) -> Result[list[int], str]:
-        solution_already_found = False
-        bit = grid[next_cell]
-        branching_factors = [self.max_num - count_bit(bit)]
-        number_to_try = 1
-        for number_to_try in range(1, self.max_num + 1):
-            if bit & 1 != 0:
-                bit >>= 1
+    def solution_path_score(self, grid: list[int], solution: list[int]) -> int:
+        """
+        score a grid whose only solution is known, as sofa_evaluate_difficulty would, without searching:
+        the path to the solution takes the one move which agrees with it at every node, so walk down that path.
+        solution lists the number of every cell.
+        >>> sudoku = Sudoku()
+        >>> sofa_puzzle = "534008010000002090000007604000500100100000003009001000305400000080200000060700382"
+        >>> solution = "534968217716342598298157634873524169152679843649831725325486971987213456461795382"
+        >>> sudoku.solution_path_score(sudoku.map_puzzle_to_grid(sofa_puzzle), [int(char) for char in solution])
+        55
+        """
+        state = DigitPositionState(self.geometry, grid)
+        branching_factors = []
+        while (next_cell := state.fewest_candidate_cell()) is not None:
+            moves = self.sofa_moves(state, next_cell)
+            branching_factors.append(len(moves))
+            (idx, number) = next(
+                (idx, number) for (idx, number) in moves if solution[idx] == number)
+            state.place(idx, number)
+        return self.difficulty_score(grid, branching_factors)
+
+    def has_other_solution(self, grid: list[int], solution: list[int], cells: Iterable[int]) -> bool:
+        """
+        check whether a grid has any solution other than the known one, given that any other solution must differ from it
+        at one of cells: the empty cells, or only the cells just emptied in a puzzle which had the solution uniquely.
+        every cell in turn is tried with the numbers other than its known one, then fixed to the known one,
+        so the branches which agree with the known solution are never searched.
+        >>> sudoku2x2 = Sudoku(width=2)
+        >>> solution = [int(char) for char in "1234341221434321"]
+        >>> grid = sudoku2x2.map_puzzle_to_grid("12343412........")
+        >>> sudoku2x2.has_other_solution(grid, solution, range(8, 16))
+        True
+        >>> grid = sudoku2x2.map_puzzle_to_grid("123434122143432.")
+        >>> sudoku2x2.has_other_solution(grid, solution, [15])
+        False
+        """
+        state = GridState(self.geometry, grid)
+        for idx in cells:
+            bit = state.grid[idx]
+            if bit < 0:
                 continue
-            bit >>= 1
-            new_grid = self.update_grid(grid, next_cell, number_to_try)
-            solver_result = self.sofa_solver_recur(
-                new_grid, ensure_unique_solution)
-            match solver_result:
-                case Err("solution to this puzzle is not unique"):
-                    return solver_result
-                case Err(_):
+            mark = state.mark()
+            for number in self.bits.available[bit]:
+                if number == solution[idx]:
                     continue
-                case Ok(branching_factors_from_recur):
-                    # a solution was found.
-                    if ensure_unique_solution:
-                        if solution_already_found:
-                            return Err("solution to this puzzle is not unique")
-                        else:
-                            branching_factors += branching_factors_from_recur
-                            solution_already_found = True
-                    else:
-                        return Ok([branching_factors] + branching_factors_from_recur)
-        if solution_already_found:
-            return Ok(branching_factors)
-        else:
-            return Err("solution not found at this route")
-
-    def generate_puzzle(self, seed=None, target_difficulty: int = 400, min_difficulty: int = 0) -> Tuple[str, str, int]:
+                state.place(idx, number)
+                if self.trail_count(state, 1):
+                    return True
+                state.undo(mark)
+            state.place(idx, solution[idx])
+        return False
+
+    def generate_puzzle(self, seed=None, target_difficulty: int = 400, min_difficulty: int = 0,
+                        max_difficulty: Optional[int] = None) -> Tuple[str, str, int]:
         """
         Generate a random sudoku puzzle
         >>> sudoku = Sudoku()
@@ -740,19 +1132,24 @@ class Sudoku():
         >>> (puzzle, solution, score) = sudoku.generate_puzzle(min_difficulty=300)
         >>> score >= 300
         True
+
+        and at most max_difficulty if that arg was provided.
+        >>> (puzzle, solution, score) = sudoku.generate_puzzle(target_difficulty=100, max_difficulty=150)
+        >>> score <= 150
+        True
         """
 
         if not seed == None:
-            random.seed(seed)
+            self.random.seed(seed)
 
         score = 0
         puzzle = ""
         solution = ""
-        while not score or score < min_difficulty:
+        while not score or score < min_difficulty or (max_difficulty is not None and score > max_difficulty):
             solution = self.generate_random_solution()
-            base_puzzle = self.make_hole(solution)
+            (base_puzzle, base_score) = self.make_hole(solution)
             (puzzle, score) = self.adjust_puzzle(
-                base_puzzle, solution, target_difficulty)
+                base_puzzle, solution, target_difficulty, base_score=base_score)
 
         return (puzzle, solution, score)
 
@@ -768,22 +1165,25 @@ class Sudoku():
         solution = ''.join(str(-i) for i in filled_grid)
         return solution
 
-    def make_hole(self, p0: str) -> str:
+    def make_hole(self, p0: str) -> Tuple[str, int]:
         """
         randomly put 0s into filled grid to create a base puzzle to start from. check the puzzle to have unique solution before returning.
+        return the puzzle with its difficulty score.
         """
         k = self.max_num * self.width // 2  # pairs of empty cell to take away from initially
+        solution = [-cell for cell in self.map_puzzle_to_grid(p0)]
 
         for _ in range(100):
             cell_indices = list(range(self.number_of_cells // 2))
-            cells_to_remove = random.sample(cell_indices, k)
+            cells_to_remove = self.random.sample(cell_indices, k)
             # also remove the cell which is rotational counterpart
             cells_to_remove += [self.rotational_counterpart(idx)
                                 for idx in cells_to_remove]
             p1 = ''.join(
                 '0' if idx in cells_to_remove else p0[idx] for idx in range(len(p0)))
-            if self.has_unique_solution(p1):
-                return p1
+            grid = self.map_puzzle_to_grid(p1)
+            if not self.has_other_solution(grid, solution, cells_to_remove):
+                return (p1, self.solution_path_score(grid, solution))
 
         # if after 100 trials still cannot get a puzzle with unique solutions:
         raise RuntimeError('Error in generating puzzle.')
@@ -805,41 +1205,53 @@ class Sudoku():
         else:
             return 0
 
-    def adjust_puzzle(self, base_puzzle: str, solution: str, target_difficulty: int, rounds: int = 200) -> Tuple[str, int]:
+    def adjust_puzzle(self, base_puzzle: str, solution: str, target_difficulty: int, rounds: int = 200,
+                      base_score: Optional[int] = None) -> Tuple[str, int]:
         """
-        adjust the difficulty of a puzzle by removing or adding back numbers in random cells
+        adjust the difficulty of a puzzle by removing or adding back numbers in random cells.
+        base_puzzle must have solution as its only solution. base_score is its difficulty score, if already known.
+        the solution being known, a puzzle with numbers added back stays unique, and a puzzle with a pair of cells removed
+        is only checked for another solution at those two cells.
         >>> sudoku = Sudoku()
         >>> puzzle = "000000270008270045040000008000567010005009007000040000200000401900010000650304792"
         >>> solution = "516438279398276145742951368823567914465129837179843526237695481984712653651384792"
-        >>> random.seed('test')
+        >>> sudoku.random.seed('test')
         >>> sudoku.adjust_puzzle(puzzle, solution, 50)
         ('000000270008270045040000308000567010005009007000040000207000401900010000650304792', 50)
-        >>> random.seed('test')
+        >>> sudoku.random.seed('test')
         >>> sudoku.adjust_puzzle(puzzle, solution, 400)
         ('000000270008270005040000008000067010005009007000040000200000401900010000650300090', 257)
         """
-        res = self.sofa_evaluate_difficulty(base_puzzle)
-        if res.is_err():
-            raise RuntimeError(res.err())
-        p0_score = res.unwrap_or(0)
+        if base_score is None:
+            res = self.sofa_evaluate_difficulty(base_puzzle)
+            if res.is_err():
+                raise RuntimeError(res.err())
+            base_score = res.unwrap()
+        p0_score = base_score
         p0 = base_puzzle
+        solution_numbers = [-cell for cell in self.map_puzzle_to_grid(solution)]
 
         for _ in range(rounds):
+            removed_cells: list[int] = []
             if p0_score < target_difficulty:
-                idx = random.randint(0, len(p0) - 1)
+                idx = self.random.randint(0, len(p0) - 1)
                 while p0[idx] == '0':
-                    idx = random.randint(0, len(p0) - 1)
+                    idx = self.random.randint(0, len(p0) - 1)
+                removed_cells = [idx, self.rotational_counterpart(idx)]
                 p1 = replace_string(p0, idx, '0')
                 p1 = replace_string(p1, self.rotational_counterpart(idx), '0')
             else:
-                idx = random.randint(0, len(p0) - 1)
+                idx = self.random.randint(0, len(p0) - 1)
                 while p0[idx] != '0':
-                    idx = random.randint(0, len(p0) - 1)
+                    idx = self.random.randint(0, len(p0) - 1)
                 alt_idx = self.rotational_counterpart(idx)
                 p1 = replace_string(p0, idx, solution[idx])
                 p1 = replace_string(p1, alt_idx, solution[alt_idx])
 
-            p1_score = self.sofa_evaluate_difficulty(p1).unwrap_or(0)
+            grid = self.map_puzzle_to_grid(p1)
+            p1_score = 0
+            if not self.has_other_solution(grid, solution_numbers, removed_cells):
+                p1_score = self.solution_path_score(grid, solution_numbers)
             if p1_score and abs(p1_score - target_difficulty) < abs(p0_score - target_difficulty):
                 p0 = p1
                 p0_score = p1_score
@@ -2,9 +2,6 @@ import itertools
 from typing import Iterable, Optional, Tuple
 
 
-BitTable = {}
-
-
 def all_unique(iter: Iterable) -> bool:
     """ util function to check whether every element in iterable is unique
     >>> all_unique('abcd')
@@ -24,62 +21,6 @@ def all_unique(iter: Iterable) -> bool:
     return not any(elem in seen or seen.add(elem) for elem in iter)
 
 
-def count_bit(num: int) -> int:
-    """ util function to count the 1 bits in a binary number
-    >>> count_bit(0)
-    0
-
-    >>> count_bit(1)
-    1
-
-    >>> count_bit(8)
-    1
-
-    >>> count_bit(3)
-    2
-
-    >>> count_bit(500)
-    6
-    """
-    if num in BitTable:
-        return BitTable[num]
-    else:
-        count = 0
-        bit = num
-        while bit != 0:
-            count += 1
-            bit = bit & (bit - 1)
-        BitTable[num] = count
-        return count
-
-
-LookupTable = {}
-
-
-def conv_bit_to_num_list(input: int):
-    """
-    convert bit notation to a list of numbers
-    >>> conv_bit_to_num_list(0)
-    []
-    >>> conv_bit_to_num_list(3)
-    [1, 2]
-    >>> conv_bit_to_num_list(79)
-    [1, 2, 3, 4, 7]
-    """
-    if input in LookupTable:
-        return LookupTable[input]
-    nums = []
-    count = 1
-    bit = input
-    while bit != 0:
-        if bit & 1:
-            nums.append(count)
-        count += 1
-        bit >>= 1
-    LookupTable[input] = nums
-    return nums
-
-
 def replace_string(string: str, idx: int, char: str) -> str:
     """
     replace the nth char in a string
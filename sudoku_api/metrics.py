@@ -0,0 +1,86 @@
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from result import Ok, Err
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from sudoku_api.core.sudoku import SEARCH_LIMIT_EXCEEDED
+
+
+# with several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory before starting,
+# so that every worker writes its metrics there and /metrics adds them up. see gunicorn.conf.py.
+REQUESTS = Counter('sudoku_api_requests_total', 'Number of HTTP requests.',
+                   ['route', 'method', 'status'])
+LATENCY = Histogram('sudoku_api_request_duration_seconds', 'Time spent handling HTTP requests.',
+                    ['route', 'method'], buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+IN_FLIGHT = Gauge('sudoku_api_requests_in_flight', 'Number of HTTP requests being handled.',
+                  multiprocess_mode='livesum')
+SOLVER_OUTCOMES = Counter('sudoku_api_solver_outcomes_total', 'Number of puzzles submitted to the solver, by outcome.',
+                          ['outcome'])
+DB_QUERY_TIME = Histogram('sudoku_api_db_query_duration_seconds', 'Time spent in database queries.',
+                          buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+
+
+def configure_metrics(app):
+    app.before_request(start_timer)
+    app.after_request(record_status)
+    app.teardown_request(stop_timer)
+    app.add_url_rule('/metrics', 'metrics', metrics)
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def start_timer():
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def stop_timer(exception=None):
+    if 'request_start' not in g:
+        return
+    IN_FLIGHT.dec()
+    # label by the url rule rather than the path, so that /api/puzzles/<id> is one route
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    LATENCY.labels(route, request.method).observe(
+        time.perf_counter() - g.pop('request_start'))
+    status = 500 if exception else g.pop('response_status', 500)
+    REQUESTS.labels(route, request.method, status).inc()
+
+
+def record_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context of the statement, which is dropped with it even if the statement fails
+    context.query_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERY_TIME.observe(time.perf_counter() - context.query_start)
+
+
+def record_solver_outcome(result) -> None:
+    match result:
+        case Ok(solutions):
+            SOLVER_OUTCOMES.labels('solved' if len(solutions) == 1 else 'multiple').inc()
+        case Err(msg) if msg == SEARCH_LIMIT_EXCEEDED:
+            SOLVER_OUTCOMES.labels('limit_exceeded').inc()
+        case Err('puzzle is unsolvable' | 'no solution was found.'):
+            SOLVER_OUTCOMES.labels('unsolvable').inc()
+        case _:
+            SOLVER_OUTCOMES.labels('invalid').inc()
+
+
+def metrics():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
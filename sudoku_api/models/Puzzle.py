@@ -1,12 +1,19 @@
-from typing import Tuple
+import base64
+import json
+from typing import Optional, Tuple
 from sudoku_api.database import db
-from sudoku_api.core import Sudoku
+from sudoku_api.core.generator import generate_puzzles as generate_puzzles_in_parallel
 from sudoku_api.models.serializer import ma
 from marshmallow import post_load
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
 
 
 class Puzzle(db.Model):  # type: ignore
     __tablename__ = 'puzzles'
+    __table_args__ = (db.Index('ix_puzzles_puzzle', 'puzzle', unique=True),
+                      # for pages sorted by difficulty, see get_puzzles
+                      db.Index('ix_puzzles_difficulty_id', 'difficulty', 'id'))
 
     id = db.Column(db.Integer, primary_key=True)  # type: ignore
     puzzle = db.Column(db.Text, nullable=False)  # type: ignore
@@ -38,12 +45,52 @@ def to_json(p: Puzzle):
     return puzzle_schema.dump(p)
 
 
-def get_puzzles(**kwargs) -> Tuple[list, int]:
+def encode_cursor(values: list[int]) -> str:
+    """
+    the opaque cursor of a position in a list of puzzles: the sort keys of the last puzzle seen.
+    >>> encode_cursor([120, 45])
+    'WzEyMCwgNDVd'
+    >>> decode_cursor('WzEyMCwgNDVd')
+    [120, 45]
+    >>> decode_cursor('WyJhIl0=')
+    Traceback (most recent call last):
+    ...
+    ValueError: not a valid cursor
+
+    Sort keys are 64-bit columns, so a larger number cannot be a position.
+    >>> decode_cursor(encode_cursor([2 ** 70]))
+    Traceback (most recent call last):
+    ...
+    ValueError: not a valid cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+MAX_CURSOR_VALUE = 2 ** 63 - 1
+
+
+def decode_cursor(cursor: str) -> list[int]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or not 1 <= len(values) <= 2 or \
+            not all(type(value) == int and 0 <= value <= MAX_CURSOR_VALUE for value in values):
+        raise ValueError('not a valid cursor')
+    return values
+
+
+def get_puzzles(**kwargs) -> Tuple[list, int, Optional[str]]:
+    """
+    return a page of puzzles, the number of puzzles matching the filters, and the cursor of the next page if any.
+    a page after a cursor is found by seeking the index on the sort keys, rather than skipping rows as offset does.
+    """
     filters = []
-    limit = kwargs.get("limit", 10)
+    limit = int(kwargs.get("limit", 10))
     offset = kwargs.get("offset", 0)
     sort_by = kwargs.get("sort_by", 'id')
     order = kwargs.get("order", 'asc')
+    cursor = kwargs.get("cursor")
 
     for (key, value) in kwargs.items():
         match key:
@@ -54,21 +101,47 @@ def get_puzzles(**kwargs) -> Tuple[list, int]:
             case "size":
                 filters.append(Puzzle.size == value)
 
+    # puzzles of the same difficulty are ordered by id, so that every puzzle has one position
+    descending = order == 'desc'
     match (sort_by, order):
         case ('id', 'desc'):
-            order = Puzzle.id.desc()
+            order = [Puzzle.id.desc()]
         case ('difficulty', 'asc'):
-            order = Puzzle.difficulty.asc()
+            order = [Puzzle.difficulty.asc(), Puzzle.id.asc()]
         case ('difficulty', 'desc'):
-            order = Puzzle.difficulty.desc()
+            order = [Puzzle.difficulty.desc(), Puzzle.id.desc()]
         case _:
-            order = Puzzle.id.asc()
+            order = [Puzzle.id.asc()]
 
     raw_query_result = Puzzle.query.filter(*filters)
     total_count = raw_query_result.count()
+    if cursor:
+        raw_query_result = raw_query_result.filter(
+            after_cursor(decode_cursor(cursor), sort_by, descending))
+    # one puzzle more than the page tells whether there is a next page
     query_result = raw_query_result.order_by(
-        order).limit(limit).offset(offset)
-    return ([to_json(puzzle) for puzzle in query_result], total_count)
+        *order).limit(limit + 1).offset(offset).all()
+
+    next_cursor = None
+    if len(query_result) > limit:
+        query_result = query_result[:limit]
+        last = query_result[-1]
+        next_cursor = encode_cursor(
+            [last.difficulty, last.id] if sort_by == 'difficulty' else [last.id])
+    return ([to_json(puzzle) for puzzle in query_result], total_count, next_cursor)
+
+
+def after_cursor(values: list[int], sort_by: str, descending: bool):
+    """ the filter of the puzzles after a cursor """
+    if sort_by != 'difficulty':
+        return Puzzle.id < values[-1] if descending else Puzzle.id > values[-1]
+    (difficulty, id) = values
+    # the first term lets the database seek ix_puzzles_difficulty_id, the second skips the puzzles up to the cursor
+    if descending:
+        return and_(Puzzle.difficulty <= difficulty,
+                    or_(Puzzle.difficulty < difficulty, Puzzle.id < id))
+    return and_(Puzzle.difficulty >= difficulty,
+                or_(Puzzle.difficulty > difficulty, Puzzle.id > id))
 
 
 def get_puzzle_by_id(id: int):
@@ -76,14 +149,39 @@ def get_puzzle_by_id(id: int):
     return puzzle_schema.dump(puzzle)
 
 
-def generate_puzzles(width: int = 3, height: int = 3, number: int = 20, min_difficulty=0) -> list[Puzzle]:
-    if number < 1:
-        return []
-    sudoku = Sudoku(width=width, height=height)
-    puzzles = []
-    for _ in range(number):
-        (puzzle, solution, score) = sudoku.generate_puzzle(
-            min_difficulty=min_difficulty)
-        puzzles.append(Puzzle(puzzle=puzzle, solution=solution,
-                       difficulty=score, size=f'{width}x{height}'))
-    return puzzles
+def generate_puzzles(width: int = 3, height: int = 3, number: int = 20, min_difficulty=0,
+                     seed=None, workers: Optional[int] = None) -> list[Puzzle]:
+    """ generate puzzles across a process pool. the same seed always gives the same puzzles, whatever the number of workers """
+    generated = generate_puzzles_in_parallel(number, seed, width=width, height=height,
+                                             min_difficulty=min_difficulty, workers=workers)
+    return [Puzzle(puzzle=puzzle, solution=solution, difficulty=score, size=f'{width}x{height}')
+            for (puzzle, solution, score) in generated]
+
+
+def insert_puzzles(rows: list[dict]) -> Optional[int]:
+    """
+    upsert rows into the puzzles table on the puzzle text with one executemany and commit: new puzzles are inserted,
+    and puzzles already there get the difficulty and solution of their row if either differs.
+    return the number of rows inserted or updated, or None if the database driver does not tell, as psycopg2 does not.
+    """
+    match db.engine.dialect.name:
+        case 'postgresql':
+            statement = update_on_conflict(postgresql.insert(Puzzle.__table__))
+        case 'sqlite':
+            statement = update_on_conflict(sqlite.insert(Puzzle.__table__))
+        case _:
+            statement = Puzzle.__table__.insert()
+    result = db.session.execute(statement, rows)
+    db.session.commit()
+    return result.rowcount if result.rowcount >= 0 else None
+
+
+def update_on_conflict(statement):
+    """ turn an insert of puzzles into an upsert on the puzzle text. puzzles which are unchanged are not rewritten,
+        nor counted in the rowcount """
+    table = Puzzle.__table__
+    return statement.on_conflict_do_update(
+        index_elements=['puzzle'],
+        set_={'difficulty': statement.excluded.difficulty, 'solution': statement.excluded.solution},
+        where=or_(table.c.difficulty != statement.excluded.difficulty,
+                  table.c.solution != statement.excluded.solution))
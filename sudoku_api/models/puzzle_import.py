@@ -0,0 +1,121 @@
+import json
+import re
+from itertools import islice
+from typing import Iterator, Optional, TextIO, Tuple
+
+from sudoku_api.models.Puzzle import insert_puzzles
+
+
+WHITESPACE = re.compile(r'\s*')
+# what may follow a number which is complete
+NUMBER_END = re.compile(r'[\s,\]]')
+
+
+def iter_json_records(f: TextIO, chunk_size: int = 1 << 16, max_record_size: int = 1 << 20) -> Iterator:
+    """
+    yield the values of a JSON array, or of newline-delimited JSON, read from a file chunk by chunk.
+    a file which starts with [ is read as one JSON array.
+    only one chunk and the value being decoded are held in memory at a time. a value which cannot be decoded from
+    max_record_size chars is malformed, or too large, and raises rather than reading the rest of the file.
+    >>> import io
+    >>> list(iter_json_records(io.StringIO('[{"a": 1}, {"a": [2, 3]} ]'), chunk_size=4))
+    [{'a': 1}, {'a': [2, 3]}]
+    >>> list(iter_json_records(io.StringIO('{"a": 1}\\n\\n{"a": 2}\\n12345'), chunk_size=4))
+    [{'a': 1}, {'a': 2}, 12345]
+    >>> list(iter_json_records(io.StringIO(' [ ] ')))
+    []
+    >>> list(iter_json_records(io.StringIO('[{"a": 1} {"a": 2}]')))
+    Traceback (most recent call last):
+    ...
+    ValueError: Expected ',' or ']' at char 10 of the JSON array.
+    >>> list(iter_json_records(io.StringIO('{"a": 1}\\n{"a": ')))
+    Traceback (most recent call last):
+    ...
+    json.decoder.JSONDecodeError: Expecting value: line 2 column 7 (char 15)
+    >>> lines = io.StringIO('{"a": 1}\\n{"a": x}\\n' + '{"a": 2}\\n' * 1000)
+    >>> list(iter_json_records(lines, chunk_size=4, max_record_size=20))
+    Traceback (most recent call last):
+    ...
+    ValueError: Expecting value: no JSON value could be decoded from the 20 chars at char 9.
+    >>> lines.tell() < 40
+    True
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    read = 0  # chars dropped from the front of the buffer, for error messages
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, read, eof
+        chunk = f.read(chunk_size)
+        read += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        eof = not chunk
+        return not eof
+
+    def next_char() -> str:
+        """ skip whitespace and return the next char, or '' at the end of the file """
+        nonlocal pos
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not read_more():
+                return buffer[pos:pos + 1]
+
+    in_array = next_char() == '['
+    if in_array:
+        pos += 1
+    while (char := next_char()) and not (in_array and char == ']'):
+        while True:
+            try:
+                (value, end) = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if len(buffer) - pos > max_record_size:
+                    raise ValueError(f'{e.msg}: no JSON value could be decoded from the {max_record_size} chars '
+                                     f'at char {read + pos}.')
+                # the value may go on in the next chunk
+                if read_more():
+                    continue
+                raise
+            # so may a number, unless something else follows it
+            if eof or not isinstance(value, (int, float)) or NUMBER_END.match(buffer, end) or not read_more():
+                break
+        pos = end
+        yield value
+        if in_array:
+            char = next_char()
+            if char == ',':
+                pos += 1
+            elif char != ']':
+                raise ValueError(f"Expected ',' or ']' at char {read + pos} of the JSON array.")
+    if in_array and not char:
+        raise ValueError('The JSON array is not closed.')
+
+
+def puzzle_row(record) -> dict:
+    """
+    the row of the puzzles table for a record of a seed file
+    >>> puzzle_row({"puzzle": "1.3.", "solution": "1234", "difficulty": "2", "size": "1x1", "id": 5})
+    {'puzzle': '1.3.', 'solution': '1234', 'difficulty': 2, 'size': '1x1'}
+    >>> puzzle_row({"puzzle": "1.3."})
+    Traceback (most recent call last):
+    ...
+    ValueError: A puzzle needs a puzzle, solution and difficulty: {'puzzle': '1.3.'}
+    """
+    try:
+        return {'puzzle': record['puzzle'], 'solution': record['solution'],
+                'difficulty': int(record['difficulty']), 'size': record.get('size', '3x3')}
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f'A puzzle needs a puzzle, solution and difficulty: {record}')
+
+
+def import_puzzles(f: TextIO, batch_size: int = 1000) -> Iterator[Tuple[int, Optional[int]]]:
+    """
+    import the puzzles of a JSON or newline-delimited JSON file into the puzzles table, in batches.
+    puzzles already in the table get the difficulty and solution of the file. yield the number of puzzles read and of
+    those inserted or changed after every batch, the latter being None if the database does not tell.
+    """
+    rows = map(puzzle_row, iter_json_records(f))
+    while batch := list(islice(rows, batch_size)):
+        yield (len(batch), insert_puzzles(batch))
@@ -0,0 +1,202 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from sudoku_api.core.generator import derive_seed, generate_one
+
+
+logger = logging.getLogger(__name__)
+
+
+class PuzzlePool():
+    def __init__(self, buckets: list[Tuple[int, int]], low_water: int = 10, high_water: int = 50, workers: int = 1,
+                 retry_delay: float = 5, width: int = 3, height: int = 3):
+        """ puzzles of one size generated ahead of time and kept in memory, in buckets by difficulty.
+            buckets are (min_difficulty, max_difficulty) ranges. a background thread refills every bucket which falls
+            below low_water up to high_water, generating in `workers` processes, or in the thread itself if 0.
+            a refill which fails is tried again after retry_delay seconds. every puzzle is served once only.
+            a range of difficulty which only overlaps a bucket is served with the puzzles of the bucket within it.
+            when there are none, the next refill generates puzzles for the bucket aimed at that range.
+
+        >>> pool = PuzzlePool([(0, 99), (100, 199)], low_water=1, high_water=2, workers=0)
+        >>> (pool.size, pool.sizes())
+        ('3x3', {'0-99': 0, '100-199': 0})
+        >>> pool.refill()
+        >>> pool.sizes()
+        {'0-99': 2, '100-199': 2}
+        >>> (puzzle, solution, score) = pool.take(min_difficulty=100)
+        >>> 100 <= score <= 199
+        True
+        >>> pool.take(min_difficulty=100) != (puzzle, solution, score)
+        True
+        >>> print(pool.take(min_difficulty=100))
+        None
+        >>> pool.wakeup.is_set()
+        True
+
+        A range which overlaps a bucket takes its puzzles of that difficulty, and missing ones are asked for.
+        >>> pool.covers(0, 199), pool.covers(150, 160), pool.covers(50, 150), pool.covers(500, None)
+        (True, True, True, False)
+        >>> pool.buckets[1][2].extend([('a', 'a', 120), ('b', 'b', 155)])
+        >>> pool.take(150, 160)
+        ('b', 'b', 155)
+        >>> print(pool.take(150, 160))
+        None
+        >>> pool.missed
+        {(1, 150, 160): 1}
+        >>> [task[3:] for (_, task) in pool.tasks()]
+        [(155, 100, 199)]
+        >>> pool.missed
+        {}
+        """
+        self.buckets = [(low, high, deque()) for (low, high) in sorted(buckets)]
+        self.low_water = low_water
+        self.high_water = high_water
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.master_seed = os.urandom(16).hex()
+        self.generated = 0
+        # (bucket index, min_difficulty, max_difficulty) of the ranges a bucket had no puzzle for,
+        # with the number of requests which went without
+        self.missed: dict[Tuple[int, int, int], int] = {}
+
+    @property
+    def size(self) -> str:
+        """ the size of every puzzle of the pool, as stored with puzzles """
+        return f'{self.width}x{self.height}'
+
+    def sizes(self) -> dict:
+        return {f'{low}-{high}': len(puzzles) for (low, high, puzzles) in self.buckets}
+
+    def overlapping(self, min_difficulty: int, max_difficulty: Optional[int]):
+        """ the buckets which overlap a range of difficulty, with their index """
+        return [(i, low, high, puzzles) for (i, (low, high, puzzles)) in enumerate(self.buckets)
+                if high >= min_difficulty and (max_difficulty is None or low <= max_difficulty)]
+
+    def covers(self, min_difficulty: int = 0, max_difficulty: Optional[int] = None) -> bool:
+        """ whether any bucket may hold puzzles of this difficulty """
+        return bool(self.overlapping(min_difficulty, max_difficulty))
+
+    def take(self, min_difficulty: int = 0, max_difficulty: Optional[int] = None) -> Optional[Tuple[str, str, int]]:
+        """
+        remove and return the oldest puzzle of this difficulty, from the first bucket overlapping it which has any,
+        or None if there is none until the refill thread catches up
+        """
+        found = None
+        with self.lock:
+            overlapping = self.overlapping(min_difficulty, max_difficulty)
+            for (_, _, _, puzzles) in overlapping:
+                found = next((puzzle for puzzle in puzzles if puzzle[2] >= min_difficulty
+                              and (max_difficulty is None or puzzle[2] <= max_difficulty)), None)
+                if found is not None:
+                    puzzles.remove(found)
+                    break
+            if found is None and overlapping:
+                (i, low, high, puzzles) = overlapping[0]
+                wanted = (i, max(low, min_difficulty), high if max_difficulty is None else min(high, max_difficulty))
+                # a bucket within the range is refilled anyway once empty. the others only grow up to twice
+                # high_water with puzzles aimed at a range, which may be one no puzzle ever falls in.
+                if wanted[1:] != (low, high) and len(puzzles) + sum(self.missed.values()) < 2 * self.high_water:
+                    self.missed[wanted] = self.missed.get(wanted, 0) + 1
+        if self.missed or any(len(puzzles) < self.low_water for (_, _, puzzles) in self.buckets):
+            self.wakeup.set()
+        return found
+
+    def tasks(self) -> list[Tuple[deque, tuple]]:
+        """
+        the generate_one tasks to bring every bucket below low_water up to high_water, with the bucket of each,
+        then a task per request which missed a range of a bucket. buckets take turns, so that no bucket waits for all
+        the others to be refilled. the puzzles asked for a range aim at its middle, but may have any difficulty of
+        their bucket, as there may be none in the range.
+        """
+        tasks = []
+        with self.lock:
+            wanted = [(low, high, puzzles, self.high_water - len(puzzles))
+                      for (low, high, puzzles) in self.buckets if len(puzzles) < self.low_water]
+            for i in range(self.high_water):
+                for (low, high, puzzles, number) in wanted:
+                    if i < number:
+                        seed = derive_seed(self.master_seed, self.generated)
+                        self.generated += 1
+                        tasks.append((puzzles, (seed, self.width, self.height, (low + high) // 2, low, high)))
+            for ((i, min_difficulty, max_difficulty), number) in self.missed.items():
+                (low, high, puzzles) = self.buckets[i]
+                for _ in range(number):
+                    seed = derive_seed(self.master_seed, self.generated)
+                    self.generated += 1
+                    tasks.append((puzzles, (seed, self.width, self.height, (min_difficulty + max_difficulty) // 2,
+                                            low, high)))
+            self.missed.clear()
+        return tasks
+
+    def refill(self, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        tasks = self.tasks()
+        to_generate = [task for (_, task) in tasks]
+        generated = executor.map(generate_one, to_generate) if executor else map(generate_one, to_generate)
+        for ((puzzles, _), puzzle) in zip(tasks, generated):
+            with self.lock:
+                puzzles.append(puzzle)
+
+    def start(self) -> None:
+        """ start the refill thread, if not yet started in this process """
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='puzzle-pool-refill', daemon=True)
+                self.thread.start()
+
+    def run(self) -> None:
+        executor = None
+        while True:
+            self.wakeup.clear()
+            try:
+                if executor is None and self.workers:
+                    # the thread runs in a threaded server, where forking may copy locks held by other threads
+                    executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+                self.refill(executor)
+            except BrokenProcessPool:
+                logger.exception('A process generating fresh puzzles died. Starting new ones.')
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                executor = None
+                time.sleep(self.retry_delay)
+                continue
+            except Exception:
+                # the thread is never started again, so it must outlive any error
+                logger.exception('Refilling the pool of fresh puzzles failed.')
+                time.sleep(self.retry_delay)
+                continue
+            self.wakeup.wait()
+
+
+def parse_buckets(buckets: str) -> list[Tuple[int, int]]:
+    """
+    >>> parse_buckets('0-99, 100-199')
+    [(0, 99), (100, 199)]
+    """
+    return [tuple(int(limit) for limit in bucket.split('-')) for bucket in buckets.split(',')]  # type: ignore
+
+
+def configure_puzzle_pool(app):
+    # the refill thread is only started by the first request for a fresh puzzle,
+    # so that every gunicorn worker starts its own after forking
+    (width, height) = (int(n) for n in app.config.get('PUZZLE_POOL_SIZE', '3x3').split('x'))
+    app.extensions['puzzle_pool'] = PuzzlePool(
+        parse_buckets(app.config.get('PUZZLE_POOL_BUCKETS', '0-99,100-199,200-299,300-499')),
+        low_water=max(app.config.get('PUZZLE_POOL_LOW_WATER', 10), 1),
+        high_water=app.config.get('PUZZLE_POOL_HIGH_WATER', 50),
+        workers=app.config.get('PUZZLE_POOL_WORKERS', 1),
+        width=width, height=height)
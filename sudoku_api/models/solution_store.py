@@ -0,0 +1,65 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterable, Optional
+from result import Ok, Result
+
+
+class SolutionStore():
+    def __init__(self, path: str):
+        """ solutions of puzzles kept in an SQLite file, shared by every worker process and kept across restarts.
+            keys are the same as the keys of SolveCache. only Ok results are stored.
+            each process and thread opens its own connection, and the database runs in WAL mode
+            so that readers are not blocked by a writer.
+
+        >>> import tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'solutions.db')
+        >>> store = SolutionStore(path)
+        >>> store.put(('1234341223414123', 'trail', 2), Ok(['1234341223414123']))
+        >>> SolutionStore(path).get(('1234341223414123', 'trail', 2))
+        Ok(['1234341223414123'])
+        >>> print(store.get(('1234341223414123', 'dlx', 2)))
+        None
+        >>> from result import Err
+        >>> store.put(('1', 'trail', 2), Err('the length of puzzle string does not match the required size'))
+        >>> print(store.get(('1', 'trail', 2)))
+        None
+        """
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        # a connection must not be shared with a forked child process, so reconnect when the pid changes
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS solutions ('
+                'puzzle TEXT NOT NULL, method TEXT NOT NULL, max_solutions INTEGER NOT NULL, solutions TEXT NOT NULL, '
+                'PRIMARY KEY (puzzle, method, max_solutions))')
+            connection.commit()
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def get(self, key: tuple) -> Optional[Result]:
+        row = self.connection().execute(
+            'SELECT solutions FROM solutions WHERE puzzle = ? AND method = ? AND max_solutions = ?', key).fetchone()
+        if row is None:
+            return None
+        return Ok(json.loads(row[0]))
+
+    def put(self, key: tuple, result: Result) -> None:
+        self.put_many([(key, result)])
+
+    def put_many(self, items: Iterable[tuple[tuple, Result]]) -> None:
+        rows = [key + (json.dumps(result.value),)
+                for (key, result) in items if isinstance(result, Ok)]
+        if not rows:
+            return
+        connection = self.connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO solutions (puzzle, method, max_solutions, solutions) VALUES (?, ?, ?, ?)', rows)
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+from result import Err, Result
+
+
+class SolveCache():
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, cache_errors: bool = False):
+        """ a bounded, thread-safe LRU cache of solver results.
+            entries older than ttl seconds are treated as missing. Err results are only kept if cache_errors is True.
+
+        >>> from result import Ok
+        >>> cache = SolveCache(maxsize=2)
+        >>> cache.put('a', Ok(['1']))
+        >>> cache.put('b', Ok(['2']))
+        >>> cache.get('a')
+        Ok(['1'])
+        >>> cache.put('c', Ok(['3']))
+        >>> print(cache.get('b'))
+        None
+        >>> cache.stats()
+        {'size': 2, 'hits': 1, 'misses': 1, 'evictions': 1}
+
+        Errors are not cached unless asked to.
+        >>> cache.put('d', Err('puzzle is unsolvable'))
+        >>> print(cache.get('d'))
+        None
+        >>> cache = SolveCache(cache_errors=True)
+        >>> cache.put('d', Err('puzzle is unsolvable'))
+        >>> cache.get('d')
+        Err('puzzle is unsolvable')
+
+        A cache of size 0 keeps nothing.
+        >>> cache = SolveCache(maxsize=0)
+        >>> cache.put('a', Ok(['1']))
+        >>> print(cache.get('a'))
+        None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_errors = cache_errors
+        self.entries: OrderedDict[Hashable, tuple[float, Result]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Result]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, result: Result) -> None:
+        if self.maxsize <= 0 or (isinstance(result, Err) and not self.cache_errors):
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
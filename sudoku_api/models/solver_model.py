@@ -1,7 +1,146 @@
-from sudoku_api.core.sudoku import Sudoku
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from result import Err
+from sudoku_api.core.sudoku import Sudoku, SEARCH_LIMIT_EXCEEDED
+from sudoku_api.core.stats import SearchStats
+from sudoku_api.core.batch import encode_puzzles, validate_puzzles, candidate_masks, has_dead_cell, VALID
+from sudoku_api.models.solve_cache import SolveCache
+from sudoku_api.models.solution_store import SolutionStore
 
 
-def solve_puzzle(puzzle: str):
-    solver = Sudoku()
-    result = solver.solve_puzzle(puzzle)
+cache = SolveCache()
+store: Optional[SolutionStore] = None
+pool: Optional[ProcessPoolExecutor] = None
+# every gunicorn worker has a pool of its own, so there are (gunicorn workers) * pool_workers solving processes
+pool_workers = 2
+# the method of the cache key of a solve which also scores the difficulty, see Sudoku.analyse_puzzle
+ANALYSE = 'analyse'
+
+
+def configure_solver(app):
+    global cache, store, pool_workers
+    cache = SolveCache(maxsize=app.config.get('SOLVER_CACHE_SIZE', 1024),
+                       ttl=app.config.get('SOLVER_CACHE_TTL'),
+                       cache_errors=app.config.get('SOLVER_CACHE_ERRORS', False))
+    store_path = app.config.get('SOLUTION_STORE_PATH')
+    store = SolutionStore(store_path) if store_path else None
+    pool_workers = app.config.get('SOLVER_POOL_WORKERS') or pool_workers
+
+
+def cache_key(puzzle: str, method: str, max_solutions: int, include_difficulty: bool = False) -> tuple:
+    return (puzzle.replace('.', '0'), ANALYSE if include_difficulty else method, max_solutions)
+
+
+def solve_key(solver: Sudoku, key: tuple, time_limit: Optional[float] = None, node_limit: Optional[int] = None):
+    """ solve the puzzle of a cache key. a key of ANALYSE gives Ok((solutions, difficulty)) rather than Ok(solutions) """
+    (puzzle, method, max_solutions) = key
+    if method == ANALYSE:
+        return solver.analyse_puzzle(puzzle, max_solutions=max_solutions, time_limit=time_limit, node_limit=node_limit)
+    return solver.solve_puzzle(
+        puzzle, method=method, max_solutions=max_solutions, time_limit=time_limit, node_limit=node_limit)
+
+
+def lookup(key: tuple):
+    """ look up a result in the in-process cache, then in the solution store shared by all processes """
+    result = cache.get(key)
+    if result is None and store is not None:
+        result = store.get(key)
+        if result is not None:
+            cache.put(key, result)
+    return result
+
+
+def save(key: tuple, result) -> None:
+    # whether a search runs out of time depends on the limits and the load, so never remember it
+    if result == Err(SEARCH_LIMIT_EXCEEDED):
+        return
+    cache.put(key, result)
+    if store is not None:
+        store.put(key, result)
+
+
+def solve_puzzle(puzzle: str, method: str = 'trail', max_solutions: int = 2,
+                 time_limit: Optional[float] = None, node_limit: Optional[int] = None, include_difficulty: bool = False):
+    """ solve a puzzle, looking up the cache first. with include_difficulty, the result is Ok((solutions, difficulty)) """
+    key = cache_key(puzzle, method, max_solutions, include_difficulty)
+    result = lookup(key)
+    if result is None:
+        result = solve_key(Sudoku(), key, time_limit, node_limit)
+        save(key, result)
     return result
+
+
+def solve_puzzle_with_stats(puzzle: str, method: str = 'trail', max_solutions: int = 2,
+                            time_limit: Optional[float] = None, node_limit: Optional[int] = None,
+                            include_difficulty: bool = False) -> tuple:
+    """ solve a puzzle without looking up the cache, and return the result with the stats of the search """
+    solver = Sudoku()
+    key = cache_key(puzzle, method, max_solutions, include_difficulty)
+    result = solve_key(solver, key, time_limit, node_limit)
+    save(key, result)
+    return (result, solver.stats)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global pool
+    if pool is None:
+        # the pool is started from a thread of a threaded server, where forking may copy locks held by other threads
+        pool = ProcessPoolExecutor(max_workers=pool_workers, mp_context=multiprocessing.get_context('spawn'))
+    return pool
+
+
+def request_key(request: dict) -> tuple:
+    return cache_key(request['puzzle'], request.get('method', 'trail'), request.get('max_solutions') or 2,
+                     request.get('include_difficulty', False))
+
+
+def solve_request(request: dict):
+    return solve_key(Sudoku(), request_key(request), request.get('time_limit'), request.get('node_limit'))
+
+
+def solve_puzzles(requests: list[dict]) -> list:
+    """
+    solve a batch of puzzles across a process pool, returning the results in the same order.
+    each request is a dict with the same keys as the body of POST /api/solver, plus optional time_limit and node_limit.
+    """
+    global pool
+    if not requests:
+        return []
+    results: list = [None] * len(requests)
+
+    # reject invalid and obviously unsolvable puzzles for the whole batch at once, before sending any to the pool
+    (chars, lengths) = encode_puzzles(request['puzzle'] for request in requests)
+    status = validate_puzzles(chars, lengths)
+    valid = (status == VALID).nonzero()[0]
+    dead = has_dead_cell(candidate_masks(chars[valid]))
+    for i in (status != VALID).nonzero()[0]:
+        results[i] = Sudoku().validate_puzzle_string(requests[i]['puzzle'])
+    for i in valid[dead]:
+        results[i] = Err('puzzle is unsolvable')
+
+    to_solve = []
+    for i in valid[~dead].tolist():
+        results[i] = lookup(request_key(requests[i]))
+        if results[i] is None:
+            to_solve.append(i)
+    if not to_solve:
+        return results
+
+    executor = get_pool()
+    chunksize = max(1, len(to_solve) // (pool_workers * 4))
+    try:
+        solved = executor.map(solve_request, [requests[i] for i in to_solve], chunksize=chunksize)
+        for (i, result) in zip(to_solve, solved):
+            results[i] = result
+            if result != Err(SEARCH_LIMIT_EXCEEDED):
+                cache.put(request_key(requests[i]), result)
+        if store is not None:
+            store.put_many((request_key(requests[i]), results[i]) for i in to_solve)
+    except BrokenProcessPool:
+        # a worker died. release the broken pool and start a new one for the next batch.
+        executor.shutdown(wait=False, cancel_futures=True)
+        pool = None
+        raise
+    return results
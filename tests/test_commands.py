@@ -0,0 +1,109 @@
+import json
+from sudoku_api import create_app
+from sudoku_api.core import Sudoku
+from sudoku_api.database import db
+from sudoku_api.models.Puzzle import Puzzle
+
+
+def make_app(path):
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def stored_puzzles(app):
+    with app.app_context():
+        return [(p.puzzle, p.solution, p.difficulty, p.size) for p in Puzzle.query.order_by(Puzzle.id)]
+
+
+def test_generate_puzzles_command(tmp_path):
+    app = make_app(tmp_path / 'full.db')
+    options = ['generate-puzzles', '--count', '5', '--size', '2x2', '--seed', 'test', '--batch-size', '2']
+    result = app.test_cli_runner().invoke(args=options + ['--workers', '2'])
+    assert result.exit_code == 0, result.output
+    assert '5/5 puzzles' in result.output
+    puzzles = stored_puzzles(app)
+    assert len(puzzles) == 5
+    for (puzzle, solution, _, size) in puzzles:
+        assert size == '2x2'
+        assert Sudoku(width=2).solve_puzzle(puzzle).unwrap() == [solution]
+
+    # resume an interrupted run from its checkpoint: only the rest is generated, and is the same as in a full run
+    checkpoint = tmp_path / 'checkpoint.json'
+    checkpoint.write_text(json.dumps({'count': 5, 'size': '2x2', 'min_difficulty': 0, 'max_difficulty': None,
+                                      'seed': 'test', 'next_index': 3}))
+    resumed_app = make_app(tmp_path / 'resumed.db')
+    result = resumed_app.test_cli_runner().invoke(
+        args=options + ['--workers', '1', '--checkpoint', str(checkpoint)])
+    assert result.exit_code == 0, result.output
+    assert 'Resuming from puzzle 3 of 5.' in result.output
+    assert stored_puzzles(resumed_app) == puzzles[3:]
+    assert not checkpoint.exists()
+
+    # the options must match the checkpoint
+    checkpoint.write_text(json.dumps({'count': 10, 'size': '2x2', 'min_difficulty': 0, 'max_difficulty': None,
+                                      'seed': 'test', 'next_index': 3}))
+    result = resumed_app.test_cli_runner().invoke(args=options + ['--checkpoint', str(checkpoint)])
+    assert result.exit_code == 2
+    assert 'different count' in result.output
+
+    # difficulty band
+    result = app.test_cli_runner().invoke(args=['generate-puzzles', '--min-difficulty', '50', '--max-difficulty', '10'])
+    assert result.exit_code == 2
+    band_app = make_app(tmp_path / 'band.db')
+    result = band_app.test_cli_runner().invoke(
+        args=['generate-puzzles', '--count', '3', '--size', '2x2', '--min-difficulty', '10', '--max-difficulty', '12',
+              '--workers', '1'])
+    assert result.exit_code == 0, result.output
+    assert all(10 <= difficulty <= 12 for (_, _, difficulty, _) in stored_puzzles(band_app))
+
+
+def test_import_puzzles_command(tmp_path):
+    app = make_app(tmp_path / 'import.db')
+    runner = app.test_cli_runner()
+
+    # db/seeds.json has 4 puzzles twice, which are only inserted once
+    result = runner.invoke(args=['import-puzzles', 'db/seeds.json', '--batch-size', '30'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 96 new or changed puzzles out of 100.' in result.output
+    puzzles = stored_puzzles(app)
+    assert len(puzzles) == 96
+    with open('db/seeds.json') as f:
+        first = json.load(f)[0]
+    assert puzzles[0] == tuple(first[key] for key in ('puzzle', 'solution', 'difficulty', 'size'))
+
+    # importing again changes nothing
+    result = runner.invoke(args=['import-puzzles', 'db/seeds.json'])
+    assert 'Imported 0 new or changed puzzles out of 100.' in result.output
+    assert stored_puzzles(app) == puzzles
+
+    # newline-delimited JSON
+    ndjson = tmp_path / 'puzzles.ndjson'
+    ndjson.write_text('{"puzzle": "1234341221434...", "solution": "1234341221434321", "difficulty": 3, "size": "2x2"}\n'
+                      '{"puzzle": "1234341221434321", "solution": "1234341221434321", "difficulty": 0, "size": "2x2"}\n')
+    result = runner.invoke(args=['import-puzzles', str(ndjson)])
+    assert 'Imported 2 new or changed puzzles out of 2.' in result.output
+
+    # a puzzle imported again with another difficulty is updated in place
+    ndjson.write_text('{"puzzle": "1234341221434...", "solution": "1234341221434321", "difficulty": 7, "size": "2x2"}\n')
+    result = runner.invoke(args=['import-puzzles', str(ndjson)])
+    assert 'Imported 1 new or changed puzzles out of 1.' in result.output
+    assert stored_puzzles(app)[-2:] == [('1234341221434...', '1234341221434321', 7, '2x2'),
+                                        ('1234341221434321', '1234341221434321', 0, '2x2')]
+
+    ndjson.write_text('{"puzzle": "1234341221434...", "solution": "1234341221434321", "difficulty": 7}\n'
+                      '{"puzzle": "1234341221434..."}\n')
+    result = runner.invoke(args=['import-puzzles', str(ndjson), '--batch-size', '1'])
+    assert result.exit_code == 1
+    assert 'A puzzle needs a puzzle, solution and difficulty' in result.output
+    assert 'The 1 puzzles read before it were committed, 0 of them new or changed.' in result.output
+
+
+def test_import_puzzles_command_without_rowcount(tmp_path, monkeypatch):
+    # PostgreSQL does not tell how many rows an executemany inserted
+    app = make_app(tmp_path / 'import.db')
+    monkeypatch.setattr('sudoku_api.models.puzzle_import.insert_puzzles', lambda rows: None)
+    result = app.test_cli_runner().invoke(args=['import-puzzles', 'db/seeds.json'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported an unknown number of new or changed puzzles out of 100.' in result.output
@@ -0,0 +1,51 @@
+from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics(client):
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+    solved = sample('sudoku_api_solver_outcomes_total', outcome='solved')
+    invalid = sample('sudoku_api_solver_outcomes_total', outcome='invalid')
+    requests = sample('sudoku_api_requests_total', route='/api/solver', method='POST', status='200')
+    by_id = sample('sudoku_api_request_duration_seconds_count', route='/api/puzzles/<int:puzzle_id>', method='GET')
+    queries = sample('sudoku_api_db_query_duration_seconds_count')
+
+    client.post('/api/solver', data={"puzzle": valid_puzzle})
+    client.post('/api/solver', data={"puzzle": "123"})
+    client.get('/api/puzzles/1')
+
+    assert sample('sudoku_api_solver_outcomes_total', outcome='solved') == solved + 1
+    assert sample('sudoku_api_solver_outcomes_total', outcome='invalid') == invalid + 1
+    assert sample('sudoku_api_requests_total', route='/api/solver', method='POST', status='200') == requests + 1
+    assert sample('sudoku_api_request_duration_seconds_count',
+                  route='/api/puzzles/<int:puzzle_id>', method='GET') == by_id + 1
+    assert sample('sudoku_api_db_query_duration_seconds_count') > queries
+    assert sample('sudoku_api_requests_in_flight') == 0
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'sudoku_api_request_duration_seconds_bucket{le="0.005",method="POST",route="/api/solver"}' in response.data
+
+
+def test_db_query_time_after_failed_query(app):
+    from sqlalchemy import text
+    from sudoku_api.database import db
+
+    with app.app_context():
+        connection = db.engine.connect()
+        try:
+            connection.execute(text('SELECT * FROM no_such_table'))
+        except Exception:
+            pass
+        # a failed query leaves nothing behind on the pooled connection, and later queries are timed on their own
+        assert 'query_start' not in connection.info
+        count = sample('sudoku_api_db_query_duration_seconds_count')
+        total = sample('sudoku_api_db_query_duration_seconds_sum')
+        connection.execute(text('SELECT 1'))
+        connection.close()
+    assert sample('sudoku_api_db_query_duration_seconds_count') == count + 1
+    assert sample('sudoku_api_db_query_duration_seconds_sum') - total < 1
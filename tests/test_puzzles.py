@@ -1,4 +1,5 @@
 from sudoku_api.core import Sudoku
+from sudoku_api.models.Puzzle import encode_cursor
 
 sudoku = Sudoku()
 
@@ -76,6 +77,10 @@ def test_puzzles_get_with_query(client):
     response = client.get('/api/puzzles?limit=5')
     assert response.status_code == 400
     assert response.json["message"] == "{'limit': ['Must be 10 or above.']}"
+    # 400: limit must be 100 or below
+    response = client.get('/api/puzzles?limit=101')
+    assert response.status_code == 400
+    assert response.json["message"] == "{'limit': ['Must be 100 or below.']}"
     response = client.get('/api/puzzles?limit=orange')
     assert response.status_code == 400
     assert response.json["message"] == "{'limit': ['Not a valid integer.']}"
@@ -150,3 +155,123 @@ def test_puzzles_get_by_id(client):
     assert response.status_code == 404
     response = client.get('/api/puzzles/invalid_id')
     assert response.status_code == 404
+
+
+def test_generate_puzzles():
+    from sudoku_api.models.Puzzle import generate_puzzles
+
+    # the same seed gives the same puzzles, whatever the number of workers
+    puzzles = generate_puzzles(width=2, height=2, number=4, seed='test', workers=1)
+    assert [(p.puzzle, p.solution, p.difficulty) for p in puzzles] == \
+        [(p.puzzle, p.solution, p.difficulty)
+         for p in generate_puzzles(width=2, height=2, number=4, seed='test', workers=3)]
+    for p in puzzles:
+        assert p.size == '2x2'
+        assert Sudoku(width=2).has_unique_solution(p.puzzle)
+        assert Sudoku(width=2).solve_puzzle(p.puzzle).unwrap()[0] == p.solution
+
+    assert generate_puzzles(number=0) == []
+
+
+def test_fresh_puzzles_get(monkeypatch):
+    from sudoku_api import create_app
+    from sudoku_api.models.puzzle_pool import PuzzlePool
+
+    # the pools are refilled here rather than by a background thread
+    monkeypatch.setattr(PuzzlePool, 'start', lambda pool: None)
+    app = create_app({'PUZZLE_POOL_BUCKETS': '0-99,100-199', 'PUZZLE_POOL_LOW_WATER': 1,
+                      'PUZZLE_POOL_HIGH_WATER': 1, 'PUZZLE_POOL_WORKERS': 0})
+    client = app.test_client()
+    pool = app.extensions['puzzle_pool']
+    # the same puzzles on every run
+    pool.master_seed = 'test'
+    pool.refill()
+
+    # 200: serve a puzzle of the requested difficulty from the pool, never the same one twice
+    response = client.get('/api/puzzles/fresh?min_difficulty=100&max_difficulty=199')
+    assert response.status_code == 200
+    puzzle = response.json["puzzle"]
+    assert 100 <= puzzle["difficulty"] <= 199
+    assert puzzle["size"] == "3x3"
+    assert sudoku.solve_puzzle(puzzle["puzzle"]).unwrap() == [puzzle["solution"]]
+    response = client.get('/api/puzzles/fresh?max_difficulty=99')
+    assert response.status_code == 200
+    assert response.json["puzzle"]["difficulty"] <= 99
+    assert response.json["puzzle"] != puzzle
+
+    # 503: the buckets are empty until the refill thread, which has been woken up, catches up
+    response = client.get('/api/puzzles/fresh')
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert pool.wakeup.is_set()
+    pool.refill()
+    assert client.get('/api/puzzles/fresh').status_code == 200
+
+    # 503, then 200: a range within a bucket is served with its puzzles of that difficulty. when it has none,
+    # the next refill aims at the range
+    pool.buckets[1][2].clear()
+    response = client.get('/api/puzzles/fresh?min_difficulty=150&max_difficulty=160')
+    assert response.status_code == 503
+    assert pool.missed == {(1, 150, 160): 1}
+    pool.refill()
+    response = client.get('/api/puzzles/fresh?min_difficulty=150&max_difficulty=160')
+    assert response.status_code == 200
+    assert 150 <= response.json["puzzle"]["difficulty"] <= 160
+
+    # 404: no bucket overlaps this difficulty
+    response = client.get('/api/puzzles/fresh?min_difficulty=500')
+    assert response.status_code == 404
+    assert response.json["message"] == ('No fresh puzzles are kept for this difficulty. '
+                                        'Ask for a difficulty within 0-99, 100-199.')
+
+    # 400: difficulty must be an integer between 0 and 1000
+    response = client.get('/api/puzzles/fresh?min_difficulty=-1')
+    assert response.status_code == 400
+    assert response.json["message"] == "{'min_difficulty': ['Difficulty must be between 0 and 1000.']}"
+
+    # every app keeps a pool of its own
+    assert create_app().extensions['puzzle_pool'] is not pool
+
+    # the size comes from the pool
+    app = create_app({'PUZZLE_POOL_SIZE': '2x2', 'PUZZLE_POOL_BUCKETS': '0-99', 'PUZZLE_POOL_LOW_WATER': 1,
+                      'PUZZLE_POOL_HIGH_WATER': 1, 'PUZZLE_POOL_WORKERS': 0})
+    app.extensions['puzzle_pool'].refill()
+    puzzle = app.test_client().get('/api/puzzles/fresh').json["puzzle"]
+    assert (puzzle["size"], len(puzzle["puzzle"])) == ("2x2", 16)
+
+
+def test_puzzles_get_with_cursor(client):
+    # 200: following next_cursor gives every puzzle once, in the same order as offset pages
+    for query in ['', '&sort_by=id&order=desc', '&sort_by=difficulty', '&sort_by=difficulty&order=desc&min_difficulty=50']:
+        response = client.get(f'/api/puzzles?limit=100{query}')
+        total_count = response.json["total_count"]
+        assert total_count <= 100
+        expected = response.json["puzzles"]
+
+        puzzles = []
+        response = client.get(f'/api/puzzles?limit=10{query}')
+        while True:
+            assert response.status_code == 200
+            assert response.json["total_count"] == total_count
+            assert response.json["puzzles"]
+            puzzles += response.json["puzzles"]
+            if not response.json["next_cursor"]:
+                break
+            response = client.get(f'/api/puzzles?limit=10{query}&cursor={response.json["next_cursor"]}')
+        assert puzzles == expected
+
+    # 400: the cursor must come from a page with the same sort_by
+    cursor = client.get('/api/puzzles?sort_by=difficulty').json["next_cursor"]
+    response = client.get(f'/api/puzzles?cursor={cursor}')
+    assert response.status_code == 400
+    assert response.json["message"] == "{'cursor': ['Not a valid cursor for this sort_by.']}"
+    for cursor in ['apple', encode_cursor([2 ** 70]), encode_cursor([-1])]:
+        response = client.get(f'/api/puzzles?cursor={cursor}')
+        assert response.status_code == 400
+        assert response.json["message"] == "{'cursor': ['Not a valid cursor.']}"
+
+    # 200: a last page which is full has no next_cursor
+    puzzles = client.get('/api/puzzles?limit=100').json["puzzles"]
+    response = client.get(f'/api/puzzles?limit=10&cursor={encode_cursor([puzzles[-11]["id"]])}')
+    assert response.json["puzzles"] == puzzles[-10:]
+    assert response.json["next_cursor"] is None
@@ -74,3 +74,261 @@ def test_solver_post(client):
     for invalid_puzzle in test_cases:
         response = client.post('/api/solver', data={"puzzle": invalid_puzzle})
         assert response.status_code == 400
+
+
+def test_solver_post_with_method(client):
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+    valid_solution = '516438279398276145742951368823567914465129837179843526237695481984712653651384792'
+
+    # 200: every solver method gives the same solution for a puzzle with unique solution
+    for method in ['trail', 'naive', 'dlx']:
+        response = client.post(
+            '/api/solver', data={"puzzle": valid_puzzle, "method": method})
+        assert response.status_code == 200
+        assert response.json["solution"] == valid_solution
+
+    # 200: dlx also reports puzzles with more than 1 solution
+    response = client.post(
+        '/api/solver', data={"puzzle": "123456789" + '.' * 72, "method": "dlx"})
+    assert response.status_code == 200
+    assert response.json["solution"] != response.json["alternative_solution"]
+
+    # 400: method must be one of the supported solvers
+    response = client.post(
+        '/api/solver', data={"puzzle": valid_puzzle, "method": "guess"})
+    assert response.status_code == 400
+    assert response.json["message"] == {
+        'method': ['Can only solve by one of: trail, naive, dlx.']}
+
+
+def test_solver_post_with_max_solutions(client):
+    multi_solution_puzzle = "123456789" + '.' * 72
+
+    # 200: return up to max_solutions solutions in a list
+    response = client.post(
+        '/api/solver', data={"puzzle": multi_solution_puzzle, "max_solutions": 5})
+    assert response.status_code == 200
+    solutions = response.json["solutions"]
+    assert len(solutions) == 5
+    assert len(set(solutions)) == 5
+    assert response.json["solution"] == solutions[0]
+    assert response.json["alternative_solution"] == solutions[1]
+    assert response.json["message"] == "more than 1 solution found for given puzzle. only returning the first 5 solutions found."
+
+    # 200: max_solutions = 1 skips looking for an alternative solution
+    response = client.post(
+        '/api/solver', data={"puzzle": multi_solution_puzzle, "max_solutions": 1})
+    assert response.status_code == 200
+    assert response.json["solutions"] == [response.json["solution"]]
+    assert "alternative_solution" not in response.json
+
+    # 400: max_solutions must be an integer between 1 and 100
+    for invalid_value in [0, 101, "many"]:
+        response = client.post(
+            '/api/solver', data={"puzzle": multi_solution_puzzle, "max_solutions": invalid_value})
+        assert response.status_code == 400
+
+
+def test_solver_batch_post(client):
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+    valid_solution = '516438279398276145742951368823567914465129837179843526237695481984712653651384792'
+    unsolvable_puzzle = "516849732307605000809700065135060907472591006968370050253186074684207500791050608"
+
+    # 200: solve a JSON array of puzzles, returning results in the same order with per-item errors
+    batch = [valid_puzzle,
+             {"puzzle": unsolvable_puzzle},
+             {"puzzle": "123456789" + '.' * 72, "max_solutions": 3, "method": "dlx"},
+             {"puzzle": 'A23456789' + '0' * 72},
+             {"puzzle": valid_puzzle, "method": "guess"},
+             42,
+             {"puzzle": valid_puzzle, "include_stats": True}]
+    response = client.post('/api/solver/batch', json=batch)
+    assert response.status_code == 200
+    results = response.json["results"]
+    assert len(results) == len(batch)
+    assert results[0] == {"solution": valid_solution, "status": 200}
+    assert results[1] == {"message": "puzzle is unsolvable", "status": 400}
+    assert results[2]["status"] == 200
+    assert len(results[2]["solutions"]) == 3
+    assert results[3]["status"] == 400
+    assert results[4] == {"message": {'method': ['Can only solve by one of: trail, naive, dlx.']},
+                          "status": 400}
+    assert results[5]["status"] == 400
+    assert results[6] == {"message": {'include_stats': ['Not supported by the batch solver.']}, "status": 400}
+
+    # 200: also accept newline-delimited JSON
+    ndjson = '\n'.join(['"' + valid_puzzle + '"', '{"puzzle": "' + unsolvable_puzzle + '"}'])
+    response = client.post('/api/solver/batch', data=ndjson,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json["results"]] == [200, 400]
+    assert response.json["results"][0]["solution"] == valid_solution
+
+    # 400: body must be a non-empty list of puzzles
+    for invalid_body in ['', 'not json', '[]', '{"puzzle": "' + valid_puzzle + '"}']:
+        response = client.post('/api/solver/batch', data=invalid_body,
+                               content_type='application/json')
+        assert response.status_code == 400
+
+    # 400: too many puzzles in a batch
+    response = client.post('/api/solver/batch', json=[valid_puzzle] * 1001)
+    assert response.status_code == 400
+    assert response.json["message"] == "Can only solve up to 1000 puzzles in a batch."
+
+
+def test_solver_cache(client):
+    from sudoku_api.models import solver_model
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+    unsolvable_puzzle = "516849732307605000809700065135060907472591006968370050253186074684207500791050608"
+
+    # a repeated puzzle is answered from the cache, with '.' and '0' treated the same
+    first = client.post('/api/solver', data={"puzzle": valid_puzzle})
+    second = client.post('/api/solver', data={"puzzle": valid_puzzle.replace('0', '.')})
+    assert first.json == second.json
+    assert solver_model.cache.stats() == {'size': 1, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+    # errors are not cached by default
+    client.post('/api/solver', data={"puzzle": unsolvable_puzzle})
+    assert solver_model.cache.stats()['size'] == 1
+
+    # the batch solver shares the same cache
+    response = client.post('/api/solver/batch', json=[valid_puzzle])
+    assert response.json["results"][0]["status"] == 200
+    assert solver_model.cache.stats()['hits'] == 2
+
+
+def test_solver_solution_store(tmp_path):
+    from sudoku_api import create_app
+    from sudoku_api.models import solver_model
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+    valid_solution = '516438279398276145742951368823567914465129837179843526237695481984712653651384792'
+    config = {"SOLUTION_STORE_PATH": str(tmp_path / 'solutions.db')}
+
+    client = create_app(config).test_client()
+    response = client.post('/api/solver', data={"puzzle": valid_puzzle})
+    assert response.json == {"solution": valid_solution}
+    client.post('/api/solver/batch', json=[{"puzzle": valid_puzzle, "method": "dlx"}])
+
+    # a new app (such as another worker, or after a restart) finds the solutions in the store
+    client = create_app(config).test_client()
+    assert solver_model.store.get(solver_model.cache_key(valid_puzzle, 'dlx', 2)).unwrap() == [valid_solution]
+    response = client.post('/api/solver', data={"puzzle": valid_puzzle})
+    assert response.json == {"solution": valid_solution}
+    assert solver_model.cache.stats()['misses'] == 1
+
+
+def test_solver_batch_broken_pool(client, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+    from sudoku_api.models import solver_model
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+
+    class BrokenPool():
+        shutdown_calls: list = []
+
+        def map(self, *args, **kwargs):
+            raise BrokenProcessPool('a worker died')
+
+        def shutdown(self, **kwargs):
+            self.shutdown_calls.append(kwargs)
+
+    # 503: a worker died. the broken pool is shut down, and a new one is started for the next batch.
+    monkeypatch.setattr(solver_model, 'pool', BrokenPool())
+    response = client.post('/api/solver/batch', json=[valid_puzzle])
+    assert response.status_code == 503
+    assert BrokenPool.shutdown_calls == [{'wait': False, 'cancel_futures': True}]
+    assert solver_model.pool is None
+
+
+def test_solver_search_limits(client):
+    hard_puzzle = '090004013460000207070000000150000390000058000600900005000740500000006109540000020'
+
+    # 422: give up when the search visits more nodes than allowed
+    response = client.post('/api/solver', data={"puzzle": hard_puzzle, "method": "naive"},
+                           headers={"X-Solver-Node-Limit": "5"})
+    assert response.status_code == 422
+    assert response.json["message"] == "Gave up solving the puzzle as it took too long."
+
+    # the result of an aborted search is not cached
+    response = client.post('/api/solver', data={"puzzle": hard_puzzle, "method": "naive"})
+    assert response.status_code == 200
+
+    response = client.post('/api/solver/batch', json=[{"puzzle": hard_puzzle, "method": "dlx"}],
+                           headers={"X-Solver-Node-Limit": "5"})
+    assert response.json["results"][0]["status"] == 422
+
+    # 400: limits in headers must be positive numbers
+    for (header, value) in [("X-Solver-Node-Limit", "0"), ("X-Solver-Node-Limit", "many"), ("X-Solver-Time-Limit", "-1")]:
+        response = client.post('/api/solver', data={"puzzle": hard_puzzle}, headers={header: value})
+        assert response.status_code == 400
+        assert response.json["message"] == f"{header} must be a positive number."
+
+
+def test_solver_search_limits_from_config():
+    from sudoku_api import create_app
+    hard_puzzle = '090004013460000207070000000150000390000058000600900005000740500000006109540000020'
+    client = create_app({"SOLVER_NODE_LIMIT": 5}).test_client()
+
+    # a header cannot raise the configured limit
+    response = client.post('/api/solver', data={"puzzle": hard_puzzle, "method": "dlx"},
+                           headers={"X-Solver-Node-Limit": "100000"})
+    assert response.status_code == 422
+
+
+def test_solver_post_with_stats(client):
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+    valid_solution = '516438279398276145742951368823567914465129837179843526237695481984712653651384792'
+
+    # 200: list the work done by the solver in stats, and the times in a Server-Timing header
+    for _ in range(2):
+        response = client.post('/api/solver', data={"puzzle": valid_puzzle, "include_stats": True})
+        assert response.status_code == 200
+        assert response.json["solution"] == valid_solution
+        stats = response.json["stats"]
+        assert set(stats) == {"nodes", "backtracks", "propagations", "max_depth",
+                              "validate_time", "map_time", "search_time"}
+        assert stats["nodes"] > 0
+        assert stats["propagations"] > 0
+        assert response.headers["Server-Timing"].startswith("validate;dur=")
+        assert ", map;dur=" in response.headers["Server-Timing"]
+
+    response = client.post('/api/solver', data={"puzzle": valid_puzzle})
+    assert "stats" not in response.json
+    assert "Server-Timing" not in response.headers
+
+
+def test_solver_post_with_difficulty(client):
+    valid_puzzle = '000000270008270045040000008000567010005009007000040000200000401900010000650304792'
+    valid_solution = '516438279398276145742951368823567914465129837179843526237695481984712653651384792'
+    multiple_solution_puzzle = '000000000008270045040000008000567010005009007000040000200000401900010000650304792'
+
+    # 200: score the difficulty in the same search, and cache it apart from the solution alone
+    for _ in range(2):
+        response = client.post('/api/solver', data={"puzzle": valid_puzzle, "include_difficulty": True})
+        assert response.status_code == 200
+        assert response.json["solution"] == valid_solution
+        assert response.json["difficulty"] == 252
+
+    response = client.post('/api/solver', data={"puzzle": valid_puzzle})
+    assert "difficulty" not in response.json
+
+    # 200: no difficulty for a puzzle which has more than one solution
+    response = client.post('/api/solver', json={"puzzle": multiple_solution_puzzle, "include_difficulty": True,
+                                                "include_stats": True})
+    assert response.status_code == 200
+    assert "alternative_solution" in response.json
+    assert response.json["difficulty"] is None
+    assert response.json["stats"]["nodes"] > 0
+
+    response = client.post('/api/solver/batch', json=[{"puzzle": valid_puzzle, "include_difficulty": True},
+                                                      valid_puzzle,
+                                                      {"puzzle": valid_puzzle, "include_difficulty": True,
+                                                       "method": "dlx"}])
+    assert response.json["results"][0]["difficulty"] == 252
+    assert "difficulty" not in response.json["results"][1]
+    assert response.json["results"][2] == {"message": {"method": ["Cannot be combined with include_difficulty."]},
+                                           "status": 400}
+
+    # 400: the difficulty is scored by a search of its own, so a method cannot be chosen
+    response = client.post('/api/solver', json={"puzzle": valid_puzzle, "include_difficulty": True, "method": "dlx"})
+    assert response.status_code == 400
+    assert response.json["message"] == {"method": ["Cannot be combined with include_difficulty."]}